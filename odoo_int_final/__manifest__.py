@@ -1,7 +1,7 @@
 
 {
     "name": "Odoo CereTax Integration",
-    "version": "18.0.1.0.0",
+    "version": "18.0.1.2.0",
     "summary": "CereTax indirect tax automation solution",
     "description": "CereTax tax automation solution helps global trnsaction tax calculation and address validation.  It caters the product taxability, customer exemptions and latest updated tax rates, tax rules and business logic.",
     "category": "Accounting",
@@ -11,8 +11,14 @@
     "data": [
         "security/odoo_int_security.xml",
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
+        "data/ceretax_log_retention_data.xml",
         "views/tax_line_views.xml",
         "views/sale_order_form_inherit.xml",
+        "views/ceretax_circuit_breaker_views.xml",
+        "views/ceretax_calc_metric_views.xml",
+        "views/ceretax_address_cache_views.xml",
+        "views/ceretax_reference_type_views.xml",
         "views/res_config_settings_views.xml",
         "views/sale_views.xml",
         "views/sale_order_ceretax_address_views.xml",
@@ -23,6 +29,11 @@
         'views/ps_code_views.xml',
         'views/product_views.xml',
         'views/fetch_ps_code_wizard_view.xml',
+        'views/ceretax_tax_consolidation_wizard_view.xml',
+        'views/ceretax_log_retention_views.xml',
+        'views/ceretax_status_outbox_views.xml',
+        'views/ceretax_calc_job_views.xml',
+        'views/ceretax_address_validation_run_views.xml',
         'views/menu_and_actions.xml',
     ],
     "demo": [],
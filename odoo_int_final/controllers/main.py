@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from odoo import http
 from odoo.http import request
+import hmac
 import logging
 _logger = logging.getLogger(__name__)
 
@@ -21,3 +22,21 @@ class OdooIntController(http.Controller):
         except Exception as e:
             _logger.exception('Webhook processing failed')
             return {'status': 'error', 'error': str(e)}
+
+    @http.route('/odoo_int_final/metrics', type='http', auth='none', methods=['GET'], csrf=False, save_session=False)
+    def metrics(self, **kw):
+        # Prometheus scrape target, protected by the ceretax.metrics_token
+        # parameter sent as a bearer token; never read from the query string
+        if not request.db:
+            return request.not_found()
+        expected = request.env['ceretax.api.mixin'].sudo()._ceretax_config().metrics_token
+        header = request.httprequest.headers.get('Authorization', '')
+        provided = header[7:] if header.startswith('Bearer ') else ''
+        if not expected or not provided or not hmac.compare_digest(provided.encode(), expected.encode()):
+            return request.not_found()
+
+        body = request.env['ceretax.http.metric'].sudo()._ceretax_prometheus()
+        return request.make_response(body, headers=[
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+            ('Cache-Control', 'no-store'),
+        ])
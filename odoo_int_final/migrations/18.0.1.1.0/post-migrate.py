@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+
+from odoo.addons.odoo_int_final.models.ceretax_transaction import extract_transaction_values
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# invoice number sent for unnamed drafts, see _build_ceretax_payload
+DRAFT_NUMBER_RE = re.compile(r"^DraftInvoice-(\d+)$")
+
+
+def _document(invoice_number, sale_order_id, orders, moves):
+    """Return the ``(res_model, res_id)`` a legacy log row was sent for.
+
+    Older versions stored the id of any calculated document, sale order or
+    invoice, in ``sale_order_id``; the invoice number sent decides which
+    one it was.
+    """
+    if sale_order_id in orders and (not invoice_number or orders[sale_order_id] == invoice_number):
+        return "sale.order", sale_order_id
+    if invoice_number:
+        move_ids = moves.get(invoice_number, ())
+        if len(move_ids) == 1:
+            return "account.move", move_ids[0]
+        draft = DRAFT_NUMBER_RE.match(invoice_number)
+        if draft and sale_order_id == int(draft.group(1)):
+            return "account.move", sale_order_id
+    return None, None
+
+
+def migrate(cr, version):
+    """Backfill the indexed lookup columns of existing ceretax.transaction rows."""
+    last_id = 0
+    updated = 0
+    while True:
+        cr.execute("""
+            SELECT id, endpoint, request_body, response_body, sale_order_id
+              FROM ceretax_transaction
+             WHERE id > %s
+          ORDER BY id
+             LIMIT %s
+        """, [last_id, BATCH_SIZE])
+        rows = cr.fetchall()
+        if not rows:
+            break
+
+        values = {
+            tx_id: extract_transaction_values(endpoint, request_body, response_body)
+            for tx_id, endpoint, request_body, response_body, _sale_order_id in rows
+        }
+        cr.execute("SELECT id, name FROM sale_order WHERE id = ANY(%s)",
+                   [[row[4] for row in rows if row[4]]])
+        orders = dict(cr.fetchall())
+        cr.execute("SELECT name, array_agg(id) FROM account_move WHERE name = ANY(%s) GROUP BY name",
+                   [[vals["invoice_number"] for vals in values.values() if vals["invoice_number"]]])
+        moves = dict(cr.fetchall())
+
+        for tx_id, _endpoint, _request_body, _response_body, sale_order_id in rows:
+            vals = values[tx_id]
+            res_model, res_id = _document(vals["invoice_number"], sale_order_id, orders, moves)
+            cr.execute("""
+                UPDATE ceretax_transaction
+                   SET invoice_number = %s, ksuid = %s, system_trace_number = %s,
+                       endpoint_family = %s, res_model = %s, res_id = %s
+                 WHERE id = %s
+            """, [vals["invoice_number"] or None, vals["ksuid"] or None,
+                  vals["system_trace_number"] or None, vals["endpoint_family"] or None,
+                  res_model, res_id, tx_id])
+        updated += len(rows)
+        last_id = rows[-1][0]
+    _logger.info("ceretax: backfilled lookup columns of %s transaction log rows", updated)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def migrate(cr, version):
+    """Parse the stored address validation texts into ceretax_validation.
+
+    Writing through the ORM recomputes ceretax_address_needs_update.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {"active_test": False})
+    Partner = env["res.partner"]
+    last_id = 0
+    parsed = 0
+    while True:
+        cr.execute("""
+            SELECT id, ceretax_last_validation
+              FROM res_partner
+             WHERE id > %s AND ceretax_last_validation IS NOT NULL
+          ORDER BY id
+             LIMIT %s
+        """, [last_id, BATCH_SIZE])
+        rows = cr.fetchall()
+        if not rows:
+            break
+        for partner_id, raw in rows:
+            data = Partner._safe_load_ceretax(raw)
+            if isinstance(data, dict) and data:
+                Partner.browse(partner_id).write({"ceretax_validation": data})
+                parsed += 1
+        Partner.flush_model()
+        env.invalidate_all()
+        last_id = rows[-1][0]
+    _logger.info("ceretax: parsed the address validation result of %s partners", parsed)
@@ -1,5 +1,15 @@
 from . import res_config_settings
 from . import ceretax_transaction
+from . import ceretax_log_retention
+from . import ceretax_calc_cache
+from . import ceretax_calc_metric
+from . import ceretax_calc_job
+from . import ceretax_address_cache
+from . import ceretax_address_validation_run
+from . import ceretax_reference_type
+from . import ceretax_circuit_breaker
+from . import ceretax_rate_limit
+from . import ceretax_http_metric
 from . import ceretax_api_mixin
 from . import ceretax_document_mixin
 # from . import product_ceretax
@@ -9,8 +19,10 @@ from . import enums
 from . import sale_order_line_tax
 from . import sale_order_line_new
 from . import account_move_ceretax
+from . import ceretax_status_outbox
 from . import sale_order_new_fixed
 from . import account_move_line_tax
+from . import account_tax_ceretax
 # from . import product_ps_code
 from . import ps_code
 from . import product_inherit
\ No newline at end of file
@@ -1,8 +1,7 @@
-from odoo import models, fields, _
+from odoo import models, fields, api, _
 from .ceretax_document_mixin import CeretaxDocumentMixin
 import json
 from odoo.exceptions import UserError
-import requests
 
 
 class AccountMove(models.Model, CeretaxDocumentMixin):
@@ -17,6 +16,31 @@ class AccountMove(models.Model, CeretaxDocumentMixin):
     ceretax_status = fields.Char()
     ceretax_last_error = fields.Text()
     ceretax_response = fields.Text()
+    ceretax_outbox_ids = fields.One2many("ceretax.status.outbox", "move_id", readonly=True)
+    ceretax_sync_state = fields.Selection([
+        ("none", "Not Synced"),
+        ("pending", "Pending"),
+        ("done", "Synced"),
+        ("failed", "Failed"),
+    ], string="CereTax Sync", compute="_compute_ceretax_sync_state", store=True, copy=False)
+    ceretax_sync_error = fields.Text(string="CereTax Sync Error", compute="_compute_ceretax_sync_error")
+
+    def _ceretax_latest_outbox(self):
+        self.ensure_one()
+        # ids grow with every queued change: the highest is the latest
+        return max(self.ceretax_outbox_ids, key=lambda e: e.id, default=None)
+
+    @api.depends("ceretax_outbox_ids.state")
+    def _compute_ceretax_sync_state(self):
+        for move in self:
+            latest = move._ceretax_latest_outbox()
+            move.ceretax_sync_state = latest.state if latest else "none"
+
+    @api.depends("ceretax_outbox_ids.last_error")
+    def _compute_ceretax_sync_error(self):
+        for move in self:
+            latest = move._ceretax_latest_outbox()
+            move.ceretax_sync_error = latest.last_error if latest else False
 
     def _ceretax_get_lines(self):
         return self.invoice_line_ids
@@ -130,32 +154,21 @@ class AccountMove(models.Model, CeretaxDocumentMixin):
             },
         ]
 
-    def _ceretax_auto_status_update(self):
+    def _ceretax_auto_status_update(self, target_state=None):
+        """Send the CereTax status of each invoice, mapped from
+        ``target_state`` when given, else from its current state."""
+        api = self.env["ceretax.api.mixin"]
+        result = None
         for move in self:
             invoice_number = move.name
-            ceretax_tx = self.env["ceretax.transaction"].sudo().search(
-                [], limit=1000)
-            matched_tx = False
-            tx_data = None
-            for tx in ceretax_tx:
-                try:
-                    body = json.loads(tx.response_body or "{}")
-                except:
-                    continue
-
-                inv = body.get("invoice", {})
-                if inv.get("invoiceNumber") == invoice_number:
-                    tx_data = body
-                    matched_tx = True
-                    break
-            if not matched_tx or not tx_data:
+            tx = self.env["ceretax.transaction"]._ceretax_find_for_invoice(move)
+            if not tx:
                 raise UserError(
                     f"No matching CereTax transaction found for invoice {invoice_number}. Click Ceretax Tax to get Tax.")
 
-            ksuid = tx_data.get("ksuid")
-            system_num = tx_data.get("systemTraceAuditNumber")
-            status = "Suspended"
-            # tx_data.get("status", {}).get("currentStatus", "Suspended")
+            ksuid = tx.ksuid
+            system_num = tx.system_trace_number
+            status = api.ceretax_status_from_state(target_state or move.state)
 
             if not ksuid:
                 raise UserError("CereTax transaction missing ksuid")
@@ -170,8 +183,7 @@ class AccountMove(models.Model, CeretaxDocumentMixin):
                 "transactionStatus": status
             }
 
-            token = self.env['ir.config_parameter'].sudo(
-            ).get_param("ceretax.api_key")
+            token = self.env["ceretax.api.mixin"]._ceretax_config().api_key
             if not token:
                 raise UserError("Missing CereTax API Key in System Parameters")
 
@@ -181,11 +193,12 @@ class AccountMove(models.Model, CeretaxDocumentMixin):
                 "x-api-key": f"{token}",
             }
 
-            url = "https://calc.cert.ceretax.net/status"
+            transport = self.env["ceretax.api.mixin"]._ceretax_transport()
 
             try:
-                response = requests.post(
-                    url, json=payload, headers=headers, timeout=40)
+                response = transport.request(
+                    "calc", "post", "status", json=payload, headers=headers,
+                    idempotent=True, budget="status")
                 response.raise_for_status()
             except Exception as e:
                 raise UserError(f"CereTax Status API Failed:\n{e}")
@@ -194,7 +207,7 @@ class AccountMove(models.Model, CeretaxDocumentMixin):
 
             # move.ceretax_status = result.get("transactionStatus")
 
-            return result
+        return result
 
     # def action_post(self):
     #     res = super().action_post()
@@ -205,48 +218,33 @@ class AccountMove(models.Model, CeretaxDocumentMixin):
     #     res = super().button_draft()
     #     self._ceretax_auto_status_update()
     #     return res
+    def _ceretax_queue_status_sync(self):
+        """Queue the CereTax status update of the customer invoices in ``self``.
+
+        The update is sent by the status outbox cron once this transaction
+        commits, keeping the HTTP call out of posting and resetting.
+        """
+        if not self.env["ceretax.api.mixin"]._ceretax_config().enabled:
+            return
+        moves = self.filtered(lambda m: m.move_type in ("out_invoice", "out_refund"))
+        self.env["ceretax.status.outbox"]._ceretax_enqueue(moves)
+
     def action_post(self):
         # Always allow posting
         res = super().action_post()
-
-        # Trigger CereTax AFTER posting, non-blocking
-        for move in self:
-            if move.move_type in ("out_invoice", "out_refund"):
-
-                # Check if CereTax is enabled
-                if self.env['ir.config_parameter'].sudo().get_param("ceretax.enable"):
-
-                    try:
-                        move._ceretax_auto_status_update()
-                    except Exception as e:
-                        # Do NOT block posting — only log message
-                        move.message_post(
-                            body=f"<b>CereTax Auto Update Failed:</b><br/>{str(e)}"
-                        )
-
+        self._ceretax_queue_status_sync()
         return res
 
     def button_draft(self):
         # Always allow reset to draft
         res = super().button_draft()
-
-        for move in self:
-            # Only invoices / credit notes
-            if move.move_type in ("out_invoice", "out_refund"):
-
-                # Check if CereTax is enabled
-                if self.env['ir.config_parameter'].sudo().get_param("ceretax.enable"):
-
-                    try:
-                        move._ceretax_auto_status_update()
-                    except Exception as e:
-                        # Log in chatter, do NOT block draft action
-                        move.message_post(
-                            body=f"<b>CereTax Auto Update Failed (Draft Reset):</b><br/>{str(e)}"
-                        )
-
+        self._ceretax_queue_status_sync()
         return res
 
+    def action_ceretax_retry_sync(self):
+        self.ceretax_outbox_ids.filtered(lambda e: e.state == "failed").action_retry()
+        return True
+
 
 class AccountMoveLine(models.Model):
     _inherit = 'account.move.line'
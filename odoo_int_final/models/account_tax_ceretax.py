@@ -0,0 +1,332 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import MissingError
+import logging
+import re
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# "State Sales Tax_417" -> ("State Sales Tax", "417")
+SUFFIX_RE = re.compile(r"^(.*)_(\d+)$")
+
+
+CONSOLIDATION_CHECKPOINT = "ceretax.tax_consolidation_checkpoint"
+
+# fields of account.tax the CereTax tax index depends on
+INDEXED_FIELDS = {"name", "amount", "amount_type", "type_tax_use", "company_id", "active"}
+
+# (dbname, company id) -> tax index built from committed rows only
+_tax_indexes = {}
+_tax_indexes_lock = threading.Lock()
+
+
+def normalize_rate(rate):
+    return round(float(rate or 0.0), 4)
+
+
+class AccountTax(models.Model):
+    _inherit = "account.tax"
+
+    ceretax_managed = fields.Boolean(string="Created by CereTax", copy=False, index=True)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self._ceretax_index_changed(res.company_id.ids)
+        return res
+
+    def write(self, vals):
+        companies = self.company_id
+        res = super().write(vals)
+        if INDEXED_FIELDS.intersection(vals):
+            self._ceretax_index_changed((companies | self.company_id).ids)
+        return res
+
+    def unlink(self):
+        companies = self.company_id
+        res = super().unlink()
+        self._ceretax_index_changed(companies.ids)
+        return res
+
+    @api.model
+    def _ceretax_index_changed(self, company_ids):
+        """Keep the tax index of ``company_ids`` out of the shared cache
+        until the transaction ends.
+
+        Until then the index is rebuilt per transaction, so taxes created
+        in a savepoint that is later rolled back never reach the shared
+        cache; after commit the stale shared index is dropped.
+        """
+        cr = self.env.cr
+        dirty = cr.postcommit.data.setdefault("ceretax.tax_index_dirty", set())
+        if not dirty:
+            dbname = cr.dbname
+
+            @cr.postcommit.add
+            def drop_indexes():
+                with _tax_indexes_lock:
+                    for company_id in dirty:
+                        _tax_indexes.pop((dbname, company_id), None)
+        dirty.update(company_ids)
+        local = cr.postcommit.data.get("ceretax.tax_index", {})
+        for company_id in company_ids:
+            local.pop(company_id, None)
+
+    @api.model
+    def _ceretax_drop_tax_index(self, company_id):
+        cr = self.env.cr
+        cr.postcommit.data.get("ceretax.tax_index", {}).pop(company_id, None)
+        with _tax_indexes_lock:
+            _tax_indexes.pop((cr.dbname, company_id), None)
+
+    @api.model
+    def _ceretax_tax_index(self, company_id):
+        """Return the CereTax index of the sale taxes of a company.
+
+        The index is shared between transactions as long as the current
+        one did not change the taxes of the company; otherwise it is only
+        kept for the current transaction.
+
+        :return: tuple ``(by_key, names, suffixes)`` where ``by_key`` maps
+                 (description, rate, amount type) to an active tax id,
+                 ``names`` is the set of used names and ``suffixes`` the
+                 highest numeric suffix used per name stem, archived taxes
+                 included
+        """
+        cr = self.env.cr
+        if company_id in cr.postcommit.data.get("ceretax.tax_index_dirty", ()):
+            local = cr.postcommit.data.setdefault("ceretax.tax_index", {})
+            if company_id not in local:
+                local[company_id] = self._ceretax_build_tax_index(company_id)
+            return local[company_id]
+
+        key = (cr.dbname, company_id)
+        with _tax_indexes_lock:
+            index = _tax_indexes.get(key)
+        if index is None:
+            index = self._ceretax_build_tax_index(company_id)
+            with _tax_indexes_lock:
+                _tax_indexes[key] = index
+        return index
+
+    @api.model
+    def _ceretax_build_tax_index(self, company_id):
+        taxes = self.sudo().with_context(active_test=False).search_read(
+            [("type_tax_use", "=", "sale"), ("company_id", "=", company_id)],
+            ["name", "amount", "amount_type", "active"],
+            order="id",
+        )
+        unsuffixed = {}
+        suffixed = {}
+        names = set()
+        suffixes = {}
+        for tax in taxes:
+            name = tax["name"] or ""
+            names.add(name)
+            match = SUFFIX_RE.match(name)
+            if match:
+                stem = match.group(1)
+                suffixes[stem] = max(suffixes.get(stem, 1), int(match.group(2)))
+            if not tax["active"]:
+                continue
+            if match:
+                suffixed.setdefault((stem, normalize_rate(tax["amount"]), tax["amount_type"]), tax["id"])
+            else:
+                unsuffixed.setdefault((name, normalize_rate(tax["amount"]), tax["amount_type"]), tax["id"])
+        # prefer the unsuffixed tax, then the oldest suffixed copy
+        by_key = dict(suffixed)
+        by_key.update(unsuffixed)
+        return by_key, frozenset(names), suffixes
+
+    @api.model
+    def _ceretax_resolve(self, company, description, rate, amount_type="percent"):
+        """Return the tax of ``company`` for a CereTax description and rate.
+
+        An existing tax with the same description (or a ``_N`` suffixed copy
+        of it) and rate is reused; a new tax is only created when none
+        matches, with a ``_N`` suffix if the name is already taken.
+        """
+        rate = normalize_rate(rate)
+        for attempt in range(2):
+            by_key, names, suffixes = self._ceretax_tax_index(company.id)
+            tax_id = by_key.get((description, rate, amount_type))
+            if tax_id:
+                tax = self.sudo().browse(tax_id)
+                try:
+                    if tax._ceretax_matches(company.id, description, rate, amount_type):
+                        return tax
+                except MissingError:
+                    pass
+            if not attempt:
+                # the index is per worker: it may predate taxes changed by
+                # another worker or a savepoint rolled back since it was built
+                self._ceretax_drop_tax_index(company.id)
+
+        name = description
+        if name in names:
+            name = f"{description}_{suffixes.get(description, 1) + 1}"
+
+        return self.sudo().create({
+            "name": name,
+            "amount": rate,
+            "amount_type": amount_type,
+            "type_tax_use": "sale",
+            "company_id": company.id,
+            "ceretax_managed": True,
+        })
+
+    def _ceretax_matches(self, company_id, description, rate, amount_type):
+        """Tell whether the tax still is what the index recorded it as."""
+        self.ensure_one()
+        match = SUFFIX_RE.match(self.name or "")
+        return (
+            self.active
+            and self.type_tax_use == "sale"
+            and self.company_id.id == company_id
+            and self.amount_type == amount_type
+            and normalize_rate(self.amount) == rate
+            and description in (self.name, match and match.group(1))
+        )
+
+    # --------------------------------------------------------------------
+    # Consolidation of duplicated CereTax taxes
+    # --------------------------------------------------------------------
+    @api.model
+    def _ceretax_duplicate_groups(self, after_id=0, limit=None):
+        """Return duplicate CereTax tax groups, ordered by kept tax id.
+
+        Only active sale taxes created by CereTax or carrying a ``_N``
+        suffix take part, so manually created taxes are never kept nor
+        archived. They are grouped by company, name stem (the name without
+        a ``_N`` suffix), rate, amount type, price inclusion, base
+        affection, scope, country and repartition setup. The first id of
+        each group is the tax to keep: the unsuffixed one, else the oldest.
+
+        :return: list of ``(keep_id, [duplicate ids])``
+        """
+        self.env.cr.execute("""
+            SELECT ids[1], ids[2:]
+              FROM (
+                SELECT array_agg(id ORDER BY (name = stem) DESC, id) AS ids
+                  FROM (
+                    SELECT tax.id, tax.company_id, tax.amount_type, tax.price_include_override,
+                           tax.include_base_amount, tax.tax_scope, tax.country_id,
+                           round(tax.amount, 4) AS amount,
+                           tax.name->>'en_US' AS name,
+                           regexp_replace(tax.name->>'en_US', '_[0-9]+$', '') AS stem,
+                           (SELECT string_agg(concat_ws(':', rep.document_type, rep.repartition_type,
+                                                        rep.factor_percent, rep.account_id,
+                                                        rep.use_in_tax_closing),
+                                              ',' ORDER BY rep.document_type, rep.sequence, rep.id)
+                              FROM account_tax_repartition_line rep
+                             WHERE rep.tax_id = tax.id) AS repartition
+                      FROM account_tax tax
+                     WHERE tax.type_tax_use = 'sale' AND tax.active
+                       AND (tax.ceretax_managed OR tax.name->>'en_US' ~ '_[0-9]+$')
+                  ) taxes
+              GROUP BY company_id, stem, amount, amount_type, price_include_override,
+                       include_base_amount, tax_scope, country_id, repartition
+                HAVING count(*) > 1
+              ) groups
+             WHERE ids[1] > %s
+          ORDER BY ids[1]
+             LIMIT %s
+        """, [after_id, limit])
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _ceretax_tax_references(self):
+        """Return the (table, line column, tax column) of the line taxes to remap.
+
+        Only sale order lines are remapped: the tax lines of a journal
+        entry, even a draft one, are derived from its line taxes and would
+        keep pointing to the archived duplicate.
+        """
+        field = self.env["sale.order.line"]._fields.get("tax_id")
+        if field and field.type == "many2many":
+            return [(field.relation, field.column1, field.column2)]
+        return []
+
+    @api.model
+    def _ceretax_consolidate(self, groups, dry_run=True):
+        """Merge each ``(keep_id, duplicate_ids)`` group into its kept tax.
+
+        Sale order line taxes pointing to a duplicate are remapped to the
+        kept tax, then the duplicates are archived. Journal entries are
+        left untouched and keep referencing the archived taxes.
+
+        :return: dict of counters
+        """
+        stats = {"groups": len(groups), "archived": 0, "references": 0}
+        cr = self.env.cr
+        for keep_id, duplicate_ids in groups:
+            for table, line_column, tax_column in self._ceretax_tax_references():
+                if dry_run:
+                    cr.execute(f'SELECT count(*) FROM "{table}" WHERE "{tax_column}" = ANY(%s)',
+                               [duplicate_ids])
+                    stats["references"] += cr.fetchone()[0]
+                    continue
+                cr.execute(f"""
+                    INSERT INTO "{table}" ("{line_column}", "{tax_column}")
+                    SELECT "{line_column}", %s FROM "{table}" WHERE "{tax_column}" = ANY(%s)
+                    ON CONFLICT DO NOTHING
+                """, [keep_id, duplicate_ids])
+                cr.execute(f'DELETE FROM "{table}" WHERE "{tax_column}" = ANY(%s)', [duplicate_ids])
+                stats["references"] += cr.rowcount
+            stats["archived"] += len(duplicate_ids)
+
+        if not dry_run and groups:
+            self.env.invalidate_all()
+            self.sudo().browse([i for _keep, ids in groups for i in ids]).write({"active": False})
+        return stats
+
+    @api.model
+    def _ceretax_consolidation_report(self, limit=50):
+        """Describe what a consolidation run would do, without changing anything."""
+        groups = self._ceretax_duplicate_groups()
+        stats = self._ceretax_consolidate(groups, dry_run=True)
+        lines = [
+            _("%(groups)s duplicate groups, %(archived)s taxes to archive, "
+              "%(references)s line references to remap.", **stats),
+        ]
+        taxes = self.sudo().with_context(active_test=False).browse(
+            [i for keep, ids in groups[:limit] for i in [keep] + ids])
+        names = {tax.id: tax.name for tax in taxes}
+        for keep_id, duplicate_ids in groups[:limit]:
+            lines.append(_("Keep %(keep)s, archive %(duplicates)s",
+                           keep=names.get(keep_id),
+                           duplicates=", ".join(names.get(i, str(i)) for i in duplicate_ids)))
+        if len(groups) > limit:
+            lines.append(_("... and %s more groups.", len(groups) - limit))
+        return "\n".join(lines)
+
+    @api.model
+    def _cron_ceretax_consolidate_taxes(self, chunk_size=100, time_budget=90):
+        """Consolidate duplicated CereTax taxes in committed chunks.
+
+        The cron is inactive by default and only started from the
+        consolidation wizard. Progress is checkpointed after every chunk so
+        an interrupted run resumes where it stopped; once done the
+        checkpoint is cleared and the cron deactivates itself.
+        """
+        icp = self.env["ir.config_parameter"].sudo()
+        started = time.monotonic()
+        while True:
+            after_id = int(icp.get_param(CONSOLIDATION_CHECKPOINT, 0) or 0)
+            groups = self._ceretax_duplicate_groups(after_id, chunk_size)
+            if not groups:
+                icp.set_param(CONSOLIDATION_CHECKPOINT, False)
+                self.env["ir.cron"]._notify_progress(done=0, remaining=0, deactivate=True)
+                self.env.cr.commit()
+                return
+
+            stats = self._ceretax_consolidate(groups, dry_run=False)
+            icp.set_param(CONSOLIDATION_CHECKPOINT, groups[-1][0])
+            self.env.cr.commit()
+            _logger.info("ceretax: consolidated %(groups)s tax groups, archived %(archived)s taxes, "
+                         "remapped %(references)s line references", stats)
+
+            if time.monotonic() - started > time_budget:
+                self.env.ref("odoo_int_final.ir_cron_ceretax_consolidate_taxes")._trigger()
+                return
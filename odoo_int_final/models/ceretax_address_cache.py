@@ -0,0 +1,120 @@
+from odoo import models, fields, api, _
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+# address validation parameters identifying an address
+ADDRESS_KEYS = ("addressLine1", "addressLine2", "city", "state", "postalCode", "country")
+PUNCTUATION_RE = re.compile(r"[.,#]")
+DEFAULT_TTL_DAYS = 30
+
+
+def normalize_address(params):
+    """Return the comparable form of the address validation ``params``."""
+    return tuple(
+        " ".join(PUNCTUATION_RE.sub(" ", str(params.get(key) or "")).upper().split())
+        for key in ADDRESS_KEYS
+    )
+
+
+def address_hash(params):
+    return hashlib.sha256("|".join(normalize_address(params)).encode()).hexdigest()
+
+
+class CeretaxAddressCache(models.Model):
+    _name = "ceretax.address.cache"
+    _description = "CereTax Address Validation Cache"
+    _order = "validated_at desc"
+    _rec_name = "address"
+
+    address_hash = fields.Char(required=True, readonly=True, index=True)
+    address = fields.Char(readonly=True, help="Normalized address the entry was stored for.")
+    result = fields.Text(readonly=True, help="Address validation response.")
+    latitude = fields.Char(readonly=True)
+    longitude = fields.Char(readonly=True)
+    plus_code = fields.Char(readonly=True)
+    validated_at = fields.Datetime(readonly=True)
+    hit_count = fields.Integer(readonly=True, default=0)
+
+    _sql_constraints = [
+        ("address_hash_uniq", "unique(address_hash)", "One cache entry per address."),
+    ]
+
+    @api.model
+    def _ceretax_ttl(self):
+        return self.env["ceretax.api.mixin"]._ceretax_config().address_cache_ttl
+
+    @api.model
+    def _ceretax_lookup(self, params):
+        """Return the cached validation of the address in ``params``, or None.
+
+        The submitted address details of the result are rebuilt from
+        ``params``.
+        """
+        ttl = self._ceretax_ttl()
+        if ttl <= 0:
+            return None
+        self.env.cr.execute("""
+            UPDATE ceretax_address_cache
+               SET hit_count = hit_count + 1
+             WHERE address_hash = %s AND validated_at > %s
+         RETURNING result
+        """, [address_hash(params), fields.Datetime.now() - timedelta(days=ttl)])
+        row = self.env.cr.fetchone()
+        if not row:
+            return None
+        try:
+            data = json.loads(row[0])
+        except (TypeError, ValueError):
+            return None
+        # the entry may have been stored for a differently spelled address:
+        # report the address submitted now, as a live response would
+        for result in data.get("results") or []:
+            if isinstance(result, dict):
+                submitted = dict(result.get("submittedAddressDetails") or {})
+                submitted.update((key, params.get(key) or "") for key in ADDRESS_KEYS)
+                result["submittedAddressDetails"] = submitted
+        return data
+
+    @api.model
+    def _ceretax_store(self, params, data):
+        """Remember the validation ``data`` of the address in ``params``."""
+        if self._ceretax_ttl() <= 0:
+            return
+        results = data.get("results") or [{}]
+        location = (results[0] or {}).get("location") or {}
+        # upsert: partners sharing an address may be validated concurrently
+        self.env.cr.execute("""
+            INSERT INTO ceretax_address_cache
+                   (address_hash, address, result, latitude, longitude, plus_code,
+                    validated_at, hit_count, create_uid, create_date, write_uid, write_date)
+            VALUES (%(hash)s, %(address)s, %(result)s, %(lat)s, %(lng)s, %(plus)s,
+                    %(now)s, 0, %(uid)s, %(now)s, %(uid)s, %(now)s)
+            ON CONFLICT (address_hash) DO UPDATE
+               SET result = EXCLUDED.result, latitude = EXCLUDED.latitude,
+                   longitude = EXCLUDED.longitude, plus_code = EXCLUDED.plus_code,
+                   validated_at = EXCLUDED.validated_at,
+                   write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+        """, {
+            "hash": address_hash(params),
+            "address": ", ".join(part for part in normalize_address(params) if part),
+            "result": json.dumps(data),
+            "lat": location.get("latitude") and str(location["latitude"]),
+            "lng": location.get("longitude") and str(location["longitude"]),
+            "plus": location.get("plusCode"),
+            "now": fields.Datetime.now(),
+            "uid": self.env.uid,
+        })
+
+    @api.model
+    def action_clear(self):
+        self.sudo().search([]).unlink()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {"message": _("CereTax address validation cache cleared."), "type": "success"},
+        }
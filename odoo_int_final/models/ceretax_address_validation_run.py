@@ -0,0 +1,203 @@
+from odoo import models, fields, api, _
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 200
+COUNTERS = ("corrected", "unchanged", "failed")
+
+
+class CeretaxAddressValidationRun(models.Model):
+    _name = "ceretax.address.validation.run"
+    _description = "CereTax Bulk Address Validation"
+    _order = "id desc"
+
+    name = fields.Char(required=True, default=lambda self: _("Address Validation %s", fields.Date.today()))
+    scope = fields.Selection([
+        ("never", "Never Validated"),
+        ("incomplete", "Missing Location"),
+        ("all", "All Addresses"),
+    ], required=True, default="never",
+        help="Missing Location selects partners without coordinates or plus code.")
+    customers_only = fields.Boolean(default=True)
+    auto_apply = fields.Boolean(string="Apply Corrections",
+                                help="Write the validated address on the partner when it differs.")
+    state = fields.Selection([
+        ("draft", "Draft"),
+        ("running", "Running"),
+        ("paused", "Paused"),
+        ("done", "Done"),
+        ("cancelled", "Cancelled"),
+    ], default="draft", required=True, readonly=True, index=True)
+    last_partner_id = fields.Integer(string="Resume After Partner", readonly=True,
+                                     help="Partners are processed by id; this is the last one done.")
+    total_count = fields.Integer(string="Partners", readonly=True)
+    processed_count = fields.Integer(readonly=True)
+    corrected_count = fields.Integer(string="Corrected", readonly=True,
+                                     help="Addresses CereTax corrected, applied or not.")
+    unchanged_count = fields.Integer(string="Unchanged", readonly=True)
+    failed_count = fields.Integer(string="Failed", readonly=True)
+    cached_count = fields.Integer(string="From Cache", readonly=True)
+    progress = fields.Float(compute="_compute_progress")
+    started_at = fields.Datetime(readonly=True)
+    finished_at = fields.Datetime(readonly=True)
+    failure_ids = fields.One2many("ceretax.address.validation.failure", "run_id", readonly=True)
+
+    @api.depends("processed_count", "total_count")
+    def _compute_progress(self):
+        for run in self:
+            run.progress = 100.0 * run.processed_count / run.total_count if run.total_count else 0.0
+
+    def _ceretax_partner_domain(self):
+        self.ensure_one()
+        domain = [
+            ("street", "!=", False),
+            ("city", "!=", False),
+            ("state_id", "!=", False),
+            ("zip", "!=", False),
+        ]
+        if self.customers_only:
+            domain.append(("customer_rank", ">", 0))
+        if self.scope == "never":
+            domain.append(("ceretax_last_validation", "=", False))
+        elif self.scope == "incomplete":
+            domain += ["|", "|", ("latitude", "=", 0), ("longitude", "=", 0), ("pluscode", "=", False)]
+        return domain
+
+    def _ceretax_validate_chunk(self, partners):
+        """Validate ``partners`` and return their outcome counters.
+
+        Cached addresses are answered right away; the others are sent
+        concurrently, the shared rate limiter keeping the threads within
+        the address validation quota.
+        """
+        self.ensure_one()
+        api = self.env["ceretax.api.mixin"]
+        counts = dict.fromkeys(COUNTERS + ("cached",), 0)
+        results = []
+        pending = []
+
+        for partner in partners:
+            try:
+                request = api._ceretax_prepare_address_request(partner)
+            except Exception as e:
+                results.append((partner, None, str(e)))
+                continue
+            if request["cached"] is not None:
+                counts["cached"] += 1
+                partner.write({"ceretax_last_validation": json.dumps(request["cached"], indent=2)})
+                results.append((partner, request["cached"], None))
+            else:
+                pending.append((partner, request))
+
+        if pending:
+            workers = min(api._ceretax_bulk_concurrency(), len(pending))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ceretax.av") as pool:
+                futures = [pool.submit(api._ceretax_send_address, request) for _p, request in pending]
+                for (partner, request), future in zip(pending, futures):
+                    try:
+                        response = future.result()
+                        with self.env.cr.savepoint():
+                            data = api._ceretax_finish_address_request(request, response, partner)
+                        results.append((partner, data, None))
+                    except Exception as e:
+                        results.append((partner, None, str(e)))
+
+        failures = []
+        for partner, data, error in results:
+            if error is None:
+                try:
+                    with self.env.cr.savepoint():
+                        if self.auto_apply:
+                            corrected = api.apply_validated_address(partner, data)
+                        else:
+                            corrected = api._check_validated_address_diff(partner, data)
+                except Exception as e:
+                    error = str(e)
+            if error is not None:
+                counts["failed"] += 1
+                failures.append({"run_id": self.id, "partner_id": partner.id, "error": error})
+            elif corrected:
+                counts["corrected"] += 1
+            else:
+                counts["unchanged"] += 1
+        self.env["ceretax.address.validation.failure"].create(failures)
+        return counts
+
+    @api.model
+    def _ceretax_chunk_size(self):
+        return self.env["ceretax.api.mixin"]._ceretax_config().address_run_chunk_size
+
+    @api.model
+    def _cron_ceretax_validate_addresses(self, time_budget=90):
+        """Validate the partners of running runs, one commit per chunk.
+
+        The id of the last partner of each committed chunk is the resume
+        point, so an interrupted run continues where it stopped.
+        """
+        Partner = self.env["res.partner"].with_context(active_test=True)
+        chunk_size = self._ceretax_chunk_size()
+        started = time.monotonic()
+        for run in self.search([("state", "=", "running")], order="id"):
+            domain = run._ceretax_partner_domain()
+            while True:
+                partners = Partner.search(
+                    domain + [("id", ">", run.last_partner_id)], order="id", limit=chunk_size)
+                if not partners:
+                    run.write({"state": "done", "finished_at": fields.Datetime.now()})
+                    self.env.cr.commit()
+                    break
+
+                counts = run._ceretax_validate_chunk(partners)
+                run.write(dict(
+                    {f"{key}_count": run[f"{key}_count"] + value for key, value in counts.items()},
+                    processed_count=run.processed_count + len(partners),
+                    last_partner_id=partners[-1].id,
+                ))
+                self.env.cr.commit()
+
+                run.invalidate_recordset(["state"])
+                if run.state != "running":
+                    break
+                if time.monotonic() - started > time_budget:
+                    self.env.ref("odoo_int_final.ir_cron_ceretax_address_validation")._trigger()
+                    return
+
+    def action_start(self):
+        for run in self.filtered(lambda r: r.state == "draft"):
+            run.write({
+                "state": "running",
+                "started_at": fields.Datetime.now(),
+                "total_count": self.env["res.partner"].search_count(run._ceretax_partner_domain()),
+            })
+        self.env.ref("odoo_int_final.ir_cron_ceretax_address_validation")._trigger()
+        return True
+
+    def action_pause(self):
+        self.filtered(lambda r: r.state == "running").write({"state": "paused"})
+        return True
+
+    def action_resume(self):
+        self.filtered(lambda r: r.state == "paused").write({"state": "running"})
+        self.env.ref("odoo_int_final.ir_cron_ceretax_address_validation")._trigger()
+        return True
+
+    def action_cancel(self):
+        self.filtered(lambda r: r.state in ("draft", "running", "paused")).write({
+            "state": "cancelled",
+            "finished_at": fields.Datetime.now(),
+        })
+        return True
+
+
+class CeretaxAddressValidationFailure(models.Model):
+    _name = "ceretax.address.validation.failure"
+    _description = "CereTax Bulk Address Validation Failure"
+    _order = "id"
+
+    run_id = fields.Many2one("ceretax.address.validation.run", required=True, ondelete="cascade", index=True)
+    partner_id = fields.Many2one("res.partner", required=True, ondelete="cascade")
+    error = fields.Text()
@@ -1,15 +1,14 @@
 
-from odoo import models, _, fields
+from odoo import models, api, tools, _, fields
 from odoo.exceptions import UserError
-import requests
 import json
 import logging
+import time
 
-
-ENVIRONMENTS = {
-    "cert": {"transaction_base": "https://calc.cert.ceretax.net"},
-    "prod": {"transaction_base": "https://calc.prod.ceretax.net"}
-}
+from .ceretax_calc_metric import elapsed_ms
+from .ceretax_config import load_config
+from .ceretax_log_buffer import log_buffer
+from .ceretax_transport import get_transport
 
 
 class CeretaxApiMixin(models.AbstractModel):
@@ -17,82 +16,134 @@ class CeretaxApiMixin(models.AbstractModel):
     _description = "CereTax API Helper"
     _logger = logging.getLogger(__name__)
 
+    @api.model
+    @tools.ormcache("company_id")
+    def _ceretax_config_snapshot(self, company_id):
+        """Read the CereTax system parameters once per database and company.
+
+        Cleared with the registry caches, which every write to
+        ``ir.config_parameter`` and the settings ``set_values`` do.
+        """
+        params = self.env["ir.config_parameter"].sudo().search_read(
+            ["|", ("key", "=like", "ceretax.%"), ("key", "=like", "odoo_ceretax.%")],
+            ["key", "value"],
+        )
+        return load_config({param["key"]: param["value"] for param in params})
+
+    def _ceretax_config(self):
+        """Return the :class:`CeretaxConfig` of the current company."""
+        return self._ceretax_config_snapshot(self.env.company.id)
+
     def _conf(self):
         """Fetch CereTax configuration with safe and flexible parsing."""
-        icp = self.env['ir.config_parameter'].sudo()
+        cfg = self._ceretax_config()
+        return {
+            "enabled": cfg.enabled,
+            "api_key": cfg.api_key,
+            "environment": cfg.environment,
+            "base": cfg.base,
+            "logging": cfg.logging,
+        }
 
-        def get_bool(key, default=False):
-            """Support True, true, 1, yes"""
-            val = icp.get_param(key, default)
-            return str(val).strip().lower() in ("true", "1", "yes")
+    def _ceretax_transport(self):
+        """Return the pooled keep-alive transport of this worker process."""
+        cfg = self._ceretax_config()
+        return get_transport(self.env.cr.dbname, cfg.environment, cfg.api_key, **cfg.transport_options)
 
-        # Read params using your PARAM mapping
-        env = icp.get_param("odoo_ceretax.environment", "cert")
-        api_key = icp.get_param("odoo_ceretax.api_key", "")
-        enabled = icp.get_param("odoo_ceretax.enable_ceretax", False)
-        logging = icp.get_param("odoo_ceretax.enable_logging", False)
-        # get_bool("odoo_ceretax.enable", False)
+    def _ceretax_request(self, method, path, payload=None, sale_order=None, sale_line=None, metrics=None):
+        request = self._ceretax_prepare_request(method, path, payload)
 
-        # Unknown environment fallback
-        base_url = ENVIRONMENTS.get(env, ENVIRONMENTS["cert"])[
-            "transaction_base"]
+        try:
+            resp = self._ceretax_send(request)
+        except Exception as e:
+            raise UserError(_("Failed to connect to CereTax: %s") % e)
+        finally:
+            if metrics is not None:
+                metrics.update(request["timings"])
 
-        return {
-            "enabled": enabled,
-            "api_key": api_key,
-            "environment": env,
-            "base": base_url,
-            "logging": logging
-        }
+        return self._ceretax_finish_request(request, resp, sale_order, sale_line)
 
-    def _ceretax_request(self, method, path, payload=None, sale_order=None, sale_line=None):
-        cfg = self._conf()
-        settings = self.env['res.config.settings'].sudo().get_values()
-        logging_enabled = settings.get("enable_logging")
-        if not cfg["enabled"]:
+    def _ceretax_prepare_request(self, method, path, payload=None):
+        """Check the configuration and build a calculation-host request.
+
+        The returned dict is sent with :meth:`_ceretax_send`, which does not
+        touch the ORM and may therefore run outside the request thread.
+        """
+        cfg = self._ceretax_config()
+        if not cfg.enabled:
             raise UserError(
                 _("CereTax is disabled in the configuration settings."))
 
-        if not cfg["api_key"]:
+        if not cfg.api_key:
             raise UserError(
                 _("CereTax API Key is missing. Configure it in settings."))
 
-        url = f"{cfg['base']}/{path}"
+        transport = self._ceretax_transport()
         headers = {
-            "x-api-key": cfg["api_key"],
+            "x-api-key": cfg.api_key,
             "Content-Type": "application/json"
         }
         data = json.dumps(payload) if payload else None
 
+        return {
+            "transport": transport,
+            "url": transport.url("calc", path),
+            "logging": cfg.logging,
+            "timings": {"payload_bytes": len(data or "")},
+            "call": {
+                "host": "calc",
+                "method": method,
+                "path": path,
+                "headers": headers,
+                "data": data,
+            },
+        }
+
+    @staticmethod
+    def _ceretax_send(request):
+        """Send a prepared request, timing it into ``request["timings"]``.
+
+        When ``request["submitted_at"]`` is set (a ``time.perf_counter()``
+        value), the time spent waiting for a worker thread is recorded too.
+        """
+        timings = request.setdefault("timings", {})
+        started = time.perf_counter()
+        if "submitted_at" in request:
+            timings["queue_ms"] = elapsed_ms(started - request["submitted_at"])
         try:
-            resp = requests.request(
-                method.upper(),
-                url,
-                headers=headers,
-                data=data,
-                timeout=30
-            )
-        except Exception as e:
-            raise UserError(_("Failed to connect to CereTax: %s") % e)
+            resp = request["transport"].request(**request["call"])
+        finally:
+            timings["network_ms"] = elapsed_ms(time.perf_counter() - started)
+        timings["server_ms"] = elapsed_ms(resp.elapsed.total_seconds())
+        timings["response_bytes"] = len(resp.content or b"")
+        return resp
+
+    def _ceretax_finish_request(self, request, resp, sale_order=None, sale_line=None):
+        """Log a sent request and turn HTTP errors into a ``UserError``."""
+        call = request["call"]
 
         # Correctly link the log to the order + line
         log_vals = {
             "name": f"CereTax Request - {fields.Datetime.now()}",
-            "endpoint": url,
-            "request_headers": json.dumps(headers),
-            "request_body": data or "",
+            "endpoint": request["url"],
+            "request_headers": json.dumps(call["headers"]),
+            "request_body": call["data"] or "",
             "status_code": resp.status_code,
             "response_body": resp.text,
+            "duration_ms": int(resp.elapsed.total_seconds() * 1000),
         }
 
         if sale_order:
-            log_vals["sale_order_id"] = sale_order.id
+            log_vals["res_model"] = sale_order._name
+            log_vals["res_id"] = sale_order.id
+            if sale_order._name == "sale.order":
+                log_vals["sale_order_id"] = sale_order.id
 
         if sale_line:
             log_vals["sale_line_id"] = sale_line.id
 
-        if logging_enabled:
-            self.env["ceretax.transaction"].sudo().create(log_vals)
+        if request["logging"]:
+            self._ceretax_log(log_vals)
 
         if resp.status_code >= 400:
             raise UserError(
@@ -101,31 +152,62 @@ class CeretaxApiMixin(models.AbstractModel):
 
         return resp
 
+    def _ceretax_log(self, vals):
+        """Queue a ``ceretax.transaction`` row.
+
+        The row is written in the background on a separate cursor once the
+        current transaction commits or rolls back, keeping the log out of
+        the request latency and preserving it when the business
+        transaction fails.
+        """
+        cfg = self._ceretax_config()
+        log_buffer.configure(max_size=cfg.log_buffer_size, max_delay=cfg.log_flush_interval)
+        log_buffer.add(self.env.cr, self.env.uid, vals)
+
+    def _ceretax_bulk_concurrency(self):
+        return self._ceretax_config().bulk_concurrency
+
     def validate_address(self, partner):
         """
         Correct implementation using CereTax Address Validation API.
         GET request with query params.
         """
+        request = self._ceretax_prepare_address_request(partner)
+
+        # partners sharing an address reuse its last validation
+        if request["cached"] is not None:
+            partner.write({
+                "ceretax_last_validation": json.dumps(request["cached"], indent=2)
+            })
+            return request["cached"]
+
+        try:
+            response = self._ceretax_send_address(request)
+        except Exception as e:
+            raise UserError(_("CereTax Address Validation failed: %s") % e)
+
+        return self._ceretax_finish_address_request(request, response, partner)
 
-        settings = self.env['res.config.settings'].sudo().get_values()
-        api_key = settings.get("api_key")
-        ceretax_enabled = settings.get("enable_ceretax")
-        ceretax_enabled_logging = settings.get("enable_logging")
-        ceretax_addressvalidation = settings.get("enable_addressvalidation")
+    def _ceretax_prepare_address_request(self, partner):
+        """Check the configuration and build the validation of ``partner``.
 
-        if not ceretax_enabled:
+        ``cached`` holds the cached result of the address when there is
+        one; otherwise the request is sent with :meth:`_ceretax_send_address`,
+        which does not touch the ORM.
+        """
+        cfg = self._ceretax_config()
+
+        if not cfg.enabled:
             raise UserError(
                 _("CereTax is disabled in the configuration settings."))
 
-        if not ceretax_addressvalidation:
+        if not cfg.address_validation:
             raise UserError(
                 _("CereTax Address Validation is disabled in the configuration settings."))
 
-        if not api_key:
+        if not cfg.api_key:
             raise UserError(_("CereTax API key not configured."))
 
-        base_url = "https://av.cert.ceretax.net/validate"
-
         if not partner.street or not partner.city or not partner.state_id.code or not partner.zip:
             raise UserError(_(
                 "No address found or incomplete address. "
@@ -144,29 +226,46 @@ class CeretaxApiMixin(models.AbstractModel):
         }
 
         headers = {
-            "x-api-key": api_key,
+            "x-api-key": cfg.api_key,
             "accept": "application/json",
         }
 
-        try:
-            response = requests.get(
-                base_url, headers=headers, params=params, timeout=20)
-        except Exception as e:
-            raise UserError(_("CereTax Address Validation failed: %s") % e)
+        return {
+            "transport": self._ceretax_transport(),
+            "logging": cfg.logging,
+            "params": params,
+            "headers": headers,
+            "cached": self.env["ceretax.address.cache"].sudo()._ceretax_lookup(params),
+        }
+
+    @staticmethod
+    def _ceretax_send_address(request):
+        return request["transport"].request(
+            "av", "get", "validate", headers=request["headers"], params=request["params"])
 
+    def _ceretax_finish_address_request(self, request, response, partner):
+        """Store, log and return the validation result of ``partner``."""
+        params = request["params"]
         if response.status_code not in (200, 201):
             raise UserError(_("CereTax returned error (%s): %s") %
                             (response.status_code, response.text))
 
         data = response.json()
+        self.env["ceretax.address.cache"].sudo()._ceretax_store(params, data)
 
-        if ceretax_enabled_logging:
+        if request["logging"]:
             # Log transaction
-            self.env["ceretax.transaction"].create({
+            self._ceretax_log({
                 "name": "Address Validation",
+                "endpoint_family": "av",
+                "res_model": partner._name,
+                "res_id": partner.id,
+                "partner_id": partner.id,
                 "request_payload": json.dumps(params),
                 "response_payload": json.dumps(data),
                 "status": "success",
+                "status_code": response.status_code,
+                "duration_ms": int(response.elapsed.total_seconds() * 1000),
             })
 
         # Save result to partner field
@@ -388,14 +487,7 @@ class CeretaxApiMixin(models.AbstractModel):
         return False
 
     def _get_invoice_profile(self):
-        icp = self.env['ir.config_parameter'].sudo()
-        return {
-            "business_type": icp.get_param("ceretax.business_type", "01"),
-            "customer_type": icp.get_param("ceretax.customer_type", "01"),
-            "unit_type": icp.get_param("ceretax.unit_type", "01"),
-            "seller_type": icp.get_param("ceretax.seller_type", "01"),
-            "profileId": icp.get_param("ceretax.profile", "sales"),
-        }
+        return self._ceretax_config().invoice_profile
 
     def ceretax_status_from_state(self, state):
         # state = order.state
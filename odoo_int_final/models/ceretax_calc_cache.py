@@ -0,0 +1,126 @@
+from odoo import models, fields, api, _
+from datetime import timedelta
+import copy
+import hashlib
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# payload keys that change without changing the taxes of a document;
+# the content period is compared separately to invalidate entries
+VOLATILE_CONFIGURATION_KEYS = ("contentYear", "contentMonth")
+
+
+class CeretaxCalcCache(models.Model):
+    _name = "ceretax.calc.cache"
+    _description = "CereTax Calculation Cache"
+    _order = "write_date desc"
+
+    res_model = fields.Char(string="Document Model", required=True, index=True)
+    res_id = fields.Integer(string="Document ID", required=True, index=True)
+    fingerprint = fields.Char(required=True)
+    content_period = fields.Char(help="CereTax content year/month of the cached response.")
+    response_body = fields.Text()
+    calculated_at = fields.Datetime()
+    hit_count = fields.Integer(default=0)
+    miss_count = fields.Integer(default=0)
+
+    _sql_constraints = [
+        ("document_uniq", "unique(res_model, res_id)", "One cache entry per document."),
+    ]
+
+    @api.model
+    def _ceretax_fingerprint(self, payload):
+        """Return a canonical hash of ``payload`` without its volatile fields."""
+        payload = copy.deepcopy(payload)
+        configuration = payload.get("configuration") or {}
+        for key in VOLATILE_CONFIGURATION_KEYS:
+            configuration.pop(key, None)
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @api.model
+    def _ceretax_content_period(self, payload):
+        configuration = payload.get("configuration") or {}
+        return "%s-%s" % (configuration.get("contentYear"), configuration.get("contentMonth"))
+
+    @api.model
+    def _ceretax_ttl(self):
+        return self.env["ceretax.api.mixin"]._ceretax_config().calc_cache_ttl
+
+    @api.model
+    def _ceretax_lookup(self, document, payload):
+        """Return True when ``payload`` matches the last applied response of
+        ``document``, in which case the calculation can be skipped."""
+        if self.env.context.get("ceretax_force_calculation"):
+            return False
+
+        ttl = self._ceretax_ttl()
+        if ttl <= 0:
+            return False
+
+        entry = self.sudo().search([
+            ("res_model", "=", document._name),
+            ("res_id", "=", document.id),
+        ], limit=1)
+
+        hit = bool(
+            entry
+            and entry.fingerprint == self._ceretax_fingerprint(payload)
+            and entry.content_period == self._ceretax_content_period(payload)
+            and entry.calculated_at
+            and entry.calculated_at + timedelta(hours=ttl) > fields.Datetime.now()
+        )
+
+        if entry:
+            column = "hit_count" if hit else "miss_count"
+            self.env.cr.execute(
+                f"UPDATE ceretax_calc_cache SET {column} = {column} + 1 WHERE id = %s",
+                [entry.id],
+            )
+            entry.invalidate_recordset([column])
+
+        if hit:
+            _logger.info("CereTax calculation cache hit for %s,%s", document._name, document.id)
+        return hit
+
+    @api.model
+    def _ceretax_store(self, document, payload, response_body):
+        """Remember the response applied to ``document`` for ``payload``."""
+        if self._ceretax_ttl() <= 0:
+            return
+
+        vals = {
+            "fingerprint": self._ceretax_fingerprint(payload),
+            "content_period": self._ceretax_content_period(payload),
+            "response_body": response_body,
+            "calculated_at": fields.Datetime.now(),
+        }
+        Cache = self.sudo()
+        entry = Cache.search([
+            ("res_model", "=", document._name),
+            ("res_id", "=", document.id),
+        ], limit=1)
+        if entry:
+            entry.write(vals)
+        else:
+            Cache.create(dict(vals, res_model=document._name, res_id=document.id, miss_count=1))
+
+    @api.model
+    def _ceretax_hit_rate(self):
+        """Return ``(hits, lookups)`` over all cached documents."""
+        self.env.cr.execute(
+            "SELECT COALESCE(SUM(hit_count), 0), COALESCE(SUM(hit_count + miss_count), 0) "
+            "FROM ceretax_calc_cache"
+        )
+        return self.env.cr.fetchone()
+
+    @api.model
+    def action_clear(self):
+        self.sudo().search([]).unlink()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {"message": _("CereTax calculation cache cleared."), "type": "success"},
+        }
@@ -0,0 +1,192 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50
+
+
+class CeretaxCalcJob(models.Model):
+    _name = "ceretax.calc.job"
+    _description = "CereTax Background Calculation"
+    _order = "id desc"
+
+    name = fields.Char(required=True, readonly=True)
+    res_model = fields.Selection([
+        ("sale.order", "Sales Order"),
+        ("account.move", "Invoice"),
+    ], string="Documents", required=True, readonly=True)
+    user_id = fields.Many2one("res.users", required=True, readonly=True, default=lambda self: self.env.user)
+    force = fields.Boolean(string="Ignore Cache", readonly=True,
+                           help="Recalculate documents even when their payload did not change.")
+    state = fields.Selection([
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("paused", "Paused"),
+        ("done", "Done"),
+        ("cancelled", "Cancelled"),
+    ], default="queued", required=True, readonly=True, index=True)
+    line_ids = fields.One2many("ceretax.calc.job.line", "job_id", readonly=True)
+    failed_line_ids = fields.One2many("ceretax.calc.job.line", "job_id",
+                                      domain=[("state", "=", "failed")], readonly=True)
+    started_at = fields.Datetime(readonly=True)
+    finished_at = fields.Datetime(readonly=True)
+
+    total_count = fields.Integer(compute="_compute_counts")
+    done_count = fields.Integer(compute="_compute_counts")
+    failed_count = fields.Integer(compute="_compute_counts")
+    pending_count = fields.Integer(compute="_compute_counts")
+    progress = fields.Float(compute="_compute_counts")
+
+    def _compute_counts(self):
+        counts = {
+            (job.id, state): count
+            for job, state, count in self.env["ceretax.calc.job.line"]._read_group(
+                [("job_id", "in", self.ids)], ["job_id", "state"], ["__count"])
+        }
+        for job in self:
+            job.done_count = counts.get((job.id, "done"), 0)
+            job.failed_count = counts.get((job.id, "failed"), 0)
+            job.pending_count = counts.get((job.id, "pending"), 0)
+            job.total_count = job.done_count + job.failed_count + job.pending_count
+            job.progress = 100.0 * (job.done_count + job.failed_count) / job.total_count if job.total_count else 0.0
+
+    @api.model
+    def _ceretax_enqueue(self, documents, force=False):
+        """Create a job calculating ``documents`` in the background."""
+        if not documents:
+            raise UserError(_("Select the documents to calculate."))
+        job = self.create({
+            "name": _("%(count)s %(model)s - %(date)s",
+                      count=len(documents),
+                      model=self.env["ir.model"]._get(documents._name).name,
+                      date=fields.Datetime.to_string(fields.Datetime.now())),
+            "res_model": documents._name,
+            "force": force,
+            "line_ids": [
+                fields.Command.create({"res_id": doc.id, "document_name": doc.display_name})
+                for doc in documents
+            ],
+        })
+        self.env.ref("odoo_int_final.ir_cron_ceretax_calc_jobs")._trigger()
+        return job
+
+    @api.model
+    def _ceretax_chunk_size(self):
+        return self.env["ceretax.api.mixin"]._ceretax_config().job_chunk_size
+
+    def _ceretax_process_chunk(self, chunk_size):
+        """Calculate the next pending documents of the job.
+
+        :return: False once no pending document is left
+        """
+        self.ensure_one()
+        lines = self.env["ceretax.calc.job.line"].search(
+            [("job_id", "=", self.id), ("state", "=", "pending")], order="id", limit=chunk_size)
+        if not lines:
+            return False
+
+        Documents = self.env[self.res_model].with_user(self.user_id).with_context(
+            allowed_company_ids=self.user_id.company_ids.ids,
+            ceretax_force_calculation=self.force,
+        )
+        documents = Documents.browse(lines.mapped("res_id")).exists()
+        try:
+            with self.env.cr.savepoint():
+                results = documents._ceretax_calculate_bulk() if documents else {}
+        except Exception as e:
+            # e.g. an access error: fail the whole chunk, keep the job going
+            results = {doc.id: str(e) for doc in documents}
+
+        now = fields.Datetime.now()
+        done = lines.filtered(lambda l: l.res_id in results and not results[l.res_id])
+        done.write({"state": "done", "error": False, "processed_at": now})
+        for line in lines - done:
+            line.write({
+                "state": "failed",
+                "error": results.get(line.res_id) or _("Document not found."),
+                "processed_at": now,
+            })
+        return True
+
+    @api.model
+    def _cron_ceretax_process_jobs(self, time_budget=90):
+        """Work through the queued and running jobs, one commit per chunk.
+
+        A job interrupted by a worker restart only loses its uncommitted
+        chunk, which is still pending and picked up again on the next run.
+        """
+        chunk_size = self._ceretax_chunk_size()
+        started = time.monotonic()
+        for job in self.search([("state", "in", ("queued", "running"))], order="id"):
+            if job.state == "queued":
+                job.write({"state": "running", "started_at": fields.Datetime.now()})
+                self.env.cr.commit()
+
+            while True:
+                more = job._ceretax_process_chunk(chunk_size)
+                if not more:
+                    job.write({"state": "done", "finished_at": fields.Datetime.now()})
+                self.env.cr.commit()
+                if not more:
+                    break
+
+                # users may pause or cancel the job meanwhile
+                job.invalidate_recordset(["state"])
+                if job.state != "running":
+                    break
+                if time.monotonic() - started > time_budget:
+                    self.env.ref("odoo_int_final.ir_cron_ceretax_calc_jobs")._trigger()
+                    return
+
+    def action_pause(self):
+        self.filtered(lambda j: j.state in ("queued", "running")).write({"state": "paused"})
+        return True
+
+    def action_resume(self):
+        self.filtered(lambda j: j.state == "paused").write({"state": "running"})
+        self.env.ref("odoo_int_final.ir_cron_ceretax_calc_jobs")._trigger()
+        return True
+
+    def action_cancel(self):
+        self.filtered(lambda j: j.state in ("queued", "running", "paused")).write({
+            "state": "cancelled",
+            "finished_at": fields.Datetime.now(),
+        })
+        return True
+
+    def action_retry_failed(self):
+        self.failed_line_ids.write({"state": "pending", "error": False})
+        self.filtered(lambda j: j.state in ("done", "cancelled")).write({"state": "running", "finished_at": False})
+        self.env.ref("odoo_int_final.ir_cron_ceretax_calc_jobs")._trigger()
+        return True
+
+
+class CeretaxCalcJobLine(models.Model):
+    _name = "ceretax.calc.job.line"
+    _description = "CereTax Background Calculation Document"
+    _order = "id"
+
+    job_id = fields.Many2one("ceretax.calc.job", required=True, ondelete="cascade", index=True)
+    res_model = fields.Selection(related="job_id.res_model")
+    res_id = fields.Integer(string="Document ID", required=True)
+    document_name = fields.Char(string="Document")
+    state = fields.Selection([
+        ("pending", "Pending"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ], default="pending", required=True, index=True)
+    error = fields.Text()
+    processed_at = fields.Datetime()
+
+    def action_open_document(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "name": self.document_name,
+            "res_model": self.res_model,
+            "res_id": self.res_id,
+            "view_mode": "form",
+        }
@@ -0,0 +1,79 @@
+from odoo import models, fields, api, _
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 30
+
+
+def elapsed_ms(seconds):
+    return round(seconds * 1000.0, 1)
+
+
+class CeretaxCalcMetric(models.Model):
+    _name = "ceretax.calc.metric"
+    _description = "CereTax Calculation Metrics"
+    _order = "calculated_at desc, id desc"
+    _rec_name = "document_name"
+
+    res_model = fields.Char(string="Document Model", readonly=True, index=True)
+    res_id = fields.Integer(string="Document ID", readonly=True)
+    document_name = fields.Char(string="Document", readonly=True)
+    calculated_at = fields.Datetime(default=fields.Datetime.now, readonly=True, index=True)
+    bulk = fields.Boolean(readonly=True, help="Calculated as part of a multi-document run.")
+    cache_hit = fields.Boolean(readonly=True)
+    failed = fields.Boolean(readonly=True)
+
+    line_count = fields.Integer(string="Lines", readonly=True, aggregator="avg")
+    payload_bytes = fields.Integer(readonly=True, aggregator="avg")
+    response_bytes = fields.Integer(readonly=True, aggregator="avg")
+    sql_count = fields.Integer(string="SQL Queries", readonly=True, aggregator="avg")
+
+    build_ms = fields.Float(string="Build (ms)", readonly=True, aggregator="avg",
+                            help="Building the payload from the document.")
+    queue_ms = fields.Float(string="Queue (ms)", readonly=True, aggregator="avg",
+                            help="Waiting for a free worker thread in bulk runs.")
+    network_ms = fields.Float(string="Network (ms)", readonly=True, aggregator="avg",
+                              help="Wall time of the HTTP call, including rate limiting, "
+                                   "retries and the response download.")
+    server_ms = fields.Float(string="Time to Headers (ms)", readonly=True, aggregator="avg",
+                             help="Connection, TLS and CereTax processing time of the last "
+                                  "attempt, until the response headers arrived.")
+    parse_ms = fields.Float(string="Parse (ms)", readonly=True, aggregator="avg")
+    apply_ms = fields.Float(string="Apply (ms)", readonly=True, aggregator="avg",
+                            help="Writing the taxes back on the document.")
+    total_ms = fields.Float(string="Total (ms)", readonly=True, aggregator="avg",
+                            help="Wall time from building the payload until the taxes were applied.")
+
+    @api.model
+    def _ceretax_record(self, vals_list):
+        if not vals_list:
+            return self
+        try:
+            with self.env.cr.savepoint():
+                return self.sudo().create(vals_list)
+        except Exception:
+            # metrics must never make a calculation fail
+            _logger.warning("ceretax: could not record calculation metrics", exc_info=True)
+            return self
+
+    @api.model
+    def _ceretax_prune(self):
+        days = self.env["ceretax.api.mixin"]._ceretax_config().calc_metrics_days
+        if days <= 0:
+            return
+        self.env.cr.execute(
+            "DELETE FROM ceretax_calc_metric WHERE calculated_at < %s",
+            [fields.Datetime.now() - timedelta(days=days)])
+        _logger.info("ceretax: pruned %s calculation metrics", self.env.cr.rowcount)
+
+    def action_open_document(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "name": self.document_name or _("Document"),
+            "res_model": self.res_model,
+            "res_id": self.res_id,
+            "view_mode": "form",
+        }
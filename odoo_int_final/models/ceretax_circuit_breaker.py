@@ -0,0 +1,212 @@
+from odoo import models, fields, api, sql_db, _
+import logging
+import threading
+import time
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling CereTax while the breaker of a host is open."""
+
+
+# seconds between two reads of the shared state by a process
+SYNC_SECONDS = 5.0
+
+# (dbname, host) -> state of the breaker in this process
+_states = {}
+_states_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker of a database, kept per process.
+
+    Calls are counted in memory; the ``ceretax_circuit_breaker`` table is
+    only written when the breaker opens, half-opens or closes, and re-read
+    every ``SYNC_SECONDS`` so trips of other workers and manual resets
+    reach every process. Database access uses a dedicated cursor and no
+    ORM, so the breaker may be called from helper threads.
+    """
+
+    def __init__(self, dbname, error_rate=0.5, min_calls=10, window=60, open_seconds=30):
+        self.dbname = dbname
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+
+    def _state(self, host):
+        # callers hold _states_lock
+        state = _states.get((self.dbname, host))
+        if state is None:
+            state = _states[(self.dbname, host)] = {
+                "state": "closed",
+                "window_start": time.monotonic(),
+                "calls": 0,
+                "failures": 0,
+                "opened_at": None,
+                "probe_started_at": None,
+                "changed_at": 0.0,
+                "synced_at": 0.0,
+            }
+        return state
+
+    def _sync(self, host):
+        """Adopt the state persisted by other workers, at most every ``SYNC_SECONDS``."""
+        now = time.monotonic()
+        with _states_lock:
+            state = self._state(host)
+            if now - state["synced_at"] < SYNC_SECONDS:
+                return
+            state["synced_at"] = now
+        try:
+            with sql_db.db_connect(self.dbname).cursor() as cr:
+                cr.execute("""
+                    SELECT state,
+                           EXTRACT(EPOCH FROM (now() AT TIME ZONE 'UTC') - opened_at),
+                           EXTRACT(EPOCH FROM (now() AT TIME ZONE 'UTC') - probe_started_at)
+                      FROM ceretax_circuit_breaker
+                     WHERE host = %s
+                """, [host])
+                row = cr.fetchone()
+        except Exception:
+            _logger.debug("ceretax: circuit breaker unavailable", exc_info=True)
+            return
+        if not row:
+            return
+        shared, open_age, probe_age = row
+        with _states_lock:
+            # a local transition since the read wins over the row
+            if state["state"] == shared or state["changed_at"] > now:
+                return
+            _logger.info("ceretax: circuit breaker of %s is %s on another worker", host, shared)
+            state.update(state=shared, calls=0, failures=0, window_start=now, changed_at=now,
+                         opened_at=now - float(open_age or 0), probe_started_at=now - float(probe_age or 0))
+
+    def before_call(self, host):
+        """Let the call through, or raise :class:`CircuitOpenError`.
+
+        Once an open breaker has cooled down, a single caller is let through
+        as the half-open probe; everybody else keeps failing fast until the
+        probe reports back.
+        """
+        self._sync(host)
+        now = time.monotonic()
+        with _states_lock:
+            state = self._state(host)
+            if state["state"] == "closed":
+                return
+            cooled_down = state["state"] == "open" and now - state["opened_at"] >= self.open_seconds
+            probe_stale = state["state"] == "half_open" and now - state["probe_started_at"] >= self.open_seconds
+            if not (cooled_down or probe_stale):
+                raise CircuitOpenError(
+                    _("CereTax circuit breaker is open for %s, failing fast. Retry shortly.") % host)
+            state.update(state="half_open", probe_started_at=now, changed_at=now)
+        self._persist(host, "half_open")
+
+    def record(self, host, success):
+        """Account the outcome of a call and trip or close the breaker."""
+        now = time.monotonic()
+        with _states_lock:
+            state = self._state(host)
+            if state["state"] == "half_open":
+                transition = "closed" if success else "open"
+            elif state["state"] == "closed":
+                if now - state["window_start"] >= self.window:
+                    state.update(window_start=now, calls=0, failures=0)
+                state["calls"] += 1
+                state["failures"] += 0 if success else 1
+                calls, failures = state["calls"], state["failures"]
+                if not (calls >= self.min_calls and failures >= self.error_rate * calls):
+                    return
+                transition = "open"
+            else:
+                return  # late outcome of a call made before the breaker opened
+            state.update(state=transition, window_start=now, calls=0, failures=0,
+                         opened_at=now, probe_started_at=None, changed_at=now)
+        if transition == "open":
+            _logger.warning("ceretax: opening circuit breaker for %s", host)
+        self._persist(host, transition)
+
+    def _persist(self, host, transition):
+        try:
+            with sql_db.db_connect(self.dbname).cursor() as cr:
+                cr.execute("""
+                    INSERT INTO ceretax_circuit_breaker (host, state, window_calls, window_failures, trip_count)
+                    VALUES (%s, 'closed', 0, 0, 0)
+                    ON CONFLICT (host) DO NOTHING
+                """, [host])
+                if transition == "open":
+                    cr.execute("""
+                        UPDATE ceretax_circuit_breaker
+                           SET state = 'open', opened_at = now() AT TIME ZONE 'UTC',
+                               last_trip_at = now() AT TIME ZONE 'UTC', trip_count = trip_count + 1,
+                               probe_started_at = NULL, window_calls = 0, window_failures = 0
+                         WHERE host = %s
+                    """, [host])
+                elif transition == "half_open":
+                    cr.execute("""
+                        UPDATE ceretax_circuit_breaker
+                           SET state = 'half_open', probe_started_at = now() AT TIME ZONE 'UTC'
+                         WHERE host = %s
+                    """, [host])
+                else:
+                    cr.execute("""
+                        UPDATE ceretax_circuit_breaker
+                           SET state = 'closed', window_start = now() AT TIME ZONE 'UTC',
+                               window_calls = 0, window_failures = 0, probe_started_at = NULL
+                         WHERE host = %s
+                    """, [host])
+        except Exception:
+            # never let the bookkeeping block the actual call
+            _logger.debug("ceretax: circuit breaker unavailable", exc_info=True)
+
+
+class CeretaxCircuitBreaker(models.Model):
+    _name = "ceretax.circuit.breaker"
+    _description = "CereTax Circuit Breaker"
+    _rec_name = "host"
+    _order = "host"
+
+    host = fields.Char(required=True, readonly=True)
+    state = fields.Selection([
+        ("closed", "Closed"),
+        ("open", "Open"),
+        ("half_open", "Half-Open"),
+    ], default="closed", required=True, readonly=True)
+    window_start = fields.Datetime(readonly=True)
+    window_calls = fields.Integer(readonly=True)
+    window_failures = fields.Integer(readonly=True)
+    opened_at = fields.Datetime(readonly=True)
+    probe_started_at = fields.Datetime(readonly=True)
+    last_trip_at = fields.Datetime(readonly=True)
+    trip_count = fields.Integer(readonly=True)
+
+    _sql_constraints = [
+        ("host_uniq", "unique(host)", "One circuit breaker per CereTax host."),
+    ]
+
+    @api.model
+    def _ceretax_summary(self):
+        breakers = self.sudo().search([])
+        if not breakers:
+            return _("No calls recorded yet.")
+        return ", ".join(
+            _("%(host)s: %(state)s (%(trips)s trips)",
+              host=b.host, state=dict(b._fields["state"].selection)[b.state], trips=b.trip_count)
+            for b in breakers
+        )
+
+    def action_reset(self):
+        breakers = self or self.sudo().search([])
+        breakers.sudo().write({
+            "state": "closed",
+            "window_start": False,
+            "window_calls": 0,
+            "window_failures": 0,
+            "opened_at": False,
+            "probe_started_at": False,
+        })
+        return True
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from .ceretax_address_cache import DEFAULT_TTL_DAYS
+from .ceretax_address_validation_run import DEFAULT_CHUNK_SIZE as DEFAULT_ADDRESS_RUN_CHUNK_SIZE
+from .ceretax_calc_job import DEFAULT_CHUNK_SIZE as DEFAULT_JOB_CHUNK_SIZE
+from .ceretax_calc_metric import DEFAULT_RETENTION_DAYS as DEFAULT_CALC_METRICS_DAYS
+from .ceretax_rate_limit import BUDGETS
+from .ceretax_status_outbox import DEFAULT_MAX_ATTEMPTS
+from .ceretax_transaction import DEFAULT_OFFLOAD_BYTES
+from .ceretax_transport import ENVIRONMENTS, DEFAULT_TIMEOUTS
+
+DEFAULT_PS_CODE = "10010100"
+TRUE_VALUES = ("true", "1", "yes")
+
+
+@dataclass(frozen=True)
+class CeretaxConfig:
+    """Immutable snapshot of the CereTax system parameters."""
+
+    enabled: bool
+    api_key: str
+    environment: str
+    base: str
+    logging: bool
+    address_validation: bool
+    post_finalized: bool
+    tax_included: bool
+    profile: str
+    business_type: str
+    customer_type: str
+    unit_type: str
+    seller_type: str
+    ps_code: str
+    bulk_concurrency: int
+    log_buffer_size: int
+    log_flush_interval: float
+    log_body_offload_bytes: int
+    calc_cache_ttl: float
+    address_cache_ttl: float
+    calc_metrics_days: int
+    status_max_attempts: int
+    job_chunk_size: int
+    address_run_chunk_size: int
+    metrics_token: str
+    transport_options: MappingProxyType
+
+    @property
+    def invoice_profile(self):
+        return {
+            "business_type": self.business_type,
+            "customer_type": self.customer_type,
+            "unit_type": self.unit_type,
+            "seller_type": self.seller_type,
+            "profileId": self.profile,
+        }
+
+
+def load_config(params):
+    """Build a :class:`CeretaxConfig` from ``params``, a ``{key: value}``
+    dict of the ``ir.config_parameter`` rows.
+
+    The settings form stores most options twice, under ``odoo_ceretax.*``
+    and under ``ceretax.*``; the former wins when set.
+    """
+    def get(keys, default=""):
+        for key in keys:
+            value = params.get(key)
+            if value not in (None, False, ""):
+                return value
+        return default
+
+    def get_bool(*keys):
+        return str(get(keys, "")).strip().lower() in TRUE_VALUES
+
+    def get_number(key, default, cast=int):
+        try:
+            return cast(params.get(key) or default)
+        except (TypeError, ValueError):
+            return default
+
+    environment = get(("odoo_ceretax.environment", "ceretax.environment"), "cert")
+    if environment not in ENVIRONMENTS:
+        environment = "cert"
+
+    rate_limits = {}
+    for budget, _label in BUDGETS:
+        rate = get_number(f"ceretax.rate_limit_{budget}", 0.0, float)
+        rate_limits[budget] = (rate, get_number(f"ceretax.rate_burst_{budget}", 0.0, float) or rate)
+
+    return CeretaxConfig(
+        enabled=get_bool("odoo_ceretax.enable_ceretax", "ceretax.enable"),
+        api_key=get(("odoo_ceretax.api_key", "ceretax.api_key")),
+        environment=environment,
+        base=ENVIRONMENTS[environment]["transaction_base"],
+        logging=get_bool("odoo_ceretax.enable_logging", "ceretax.logging"),
+        address_validation=get_bool("odoo_ceretax.enable_addressvalidation", "ceretax.addressvalidation"),
+        post_finalized=get_bool("odoo_ceretax.post_finalized", "ceretax.post_finalized"),
+        tax_included=get_bool("odoo_ceretax.tax_included", "ceretax.tax_included"),
+        profile=get(("odoo_ceretax.profile", "ceretax.profile"), "sales"),
+        business_type=get(("odoo_ceretax.business_type", "ceretax.business_type"), "01"),
+        customer_type=get(("odoo_ceretax.customer_type", "ceretax.customer_type"), "01"),
+        unit_type=get(("odoo_ceretax.unit_type", "ceretax.unit_type"), "01"),
+        seller_type=get(("odoo_ceretax.seller_type", "ceretax.seller_type"), "01"),
+        ps_code=get(("odoo_ceretax.ps_code", "ceretax.ps_code"), DEFAULT_PS_CODE),
+        bulk_concurrency=max(1, get_number("ceretax.bulk_concurrency", 4)),
+        log_buffer_size=get_number("ceretax.log_buffer_size", 0),
+        log_flush_interval=get_number("ceretax.log_flush_interval", 0.0, float),
+        log_body_offload_bytes=get_number("ceretax.log_body_offload_bytes", DEFAULT_OFFLOAD_BYTES),
+        calc_cache_ttl=get_number("ceretax.calc_cache_ttl", 24.0, float),
+        address_cache_ttl=get_number("ceretax.address_cache_ttl", float(DEFAULT_TTL_DAYS), float),
+        calc_metrics_days=get_number("ceretax.calc_metrics_days", DEFAULT_CALC_METRICS_DAYS),
+        status_max_attempts=max(1, get_number("ceretax.status_max_attempts", DEFAULT_MAX_ATTEMPTS)),
+        job_chunk_size=max(1, get_number("ceretax.job_chunk_size", DEFAULT_JOB_CHUNK_SIZE)),
+        address_run_chunk_size=max(1, get_number("ceretax.address_run_chunk_size", DEFAULT_ADDRESS_RUN_CHUNK_SIZE)),
+        metrics_token=get(("ceretax.metrics_token",)),
+        transport_options=MappingProxyType({
+            "pool_connections": get_number("ceretax.http_pool_connections", 4),
+            "pool_maxsize": get_number("ceretax.http_pool_maxsize", 10),
+            "timeouts": MappingProxyType({
+                host: get_number(f"ceretax.http_timeout_{host}", default, float)
+                for host, default in DEFAULT_TIMEOUTS.items()
+            }),
+            "connect_timeout": get_number("ceretax.http_connect_timeout", 5.0, float),
+            "max_retries": get_number("ceretax.http_max_retries", 2),
+            "backoff": get_number("ceretax.http_backoff", 0.5, float),
+            "breaker": MappingProxyType({
+                "error_rate": get_number("ceretax.breaker_error_rate", 0.5, float),
+                "min_calls": get_number("ceretax.breaker_min_calls", 10),
+                "window": get_number("ceretax.breaker_window", 60),
+                "open_seconds": get_number("ceretax.breaker_open_seconds", 30),
+            }),
+            "rate_limits": MappingProxyType(rate_limits),
+            "rate_limit_max_wait": get_number("ceretax.rate_limit_max_wait", 10.0, float),
+        }),
+    )
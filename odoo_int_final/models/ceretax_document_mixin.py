@@ -1,7 +1,11 @@
 from odoo import models, api, fields, _
 from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
+import time
+
+from .ceretax_calc_metric import elapsed_ms
 
 _logger = logging.getLogger(__name__)
 
@@ -39,8 +43,7 @@ class CeretaxDocumentMixin(models.AbstractModel):
     # --------------------------------------------------------------------
     def _build_ceretax_payload(self):
         self.ensure_one()
-        icp = self.env['ir.config_parameter'].sudo()
-        settings_ps_code = icp.get_param("ceretax.ps_code", "10010100")
+        settings_ps_code = self.env['ceretax.api.mixin']._ceretax_config().ps_code
 
         lines = self._ceretax_get_lines()
         partner = self._ceretax_get_partner()
@@ -53,9 +56,8 @@ class CeretaxDocumentMixin(models.AbstractModel):
         if not partner:
             raise UserError(_('No customer/shipping address found.'))
 
-        # assign line IDs
-        for i, l in enumerate(lines, start=1):
-            l.ceretax_line_id = str(i)
+        # assign line IDs; only lines whose id changed are written
+        self._ceretax_assign_line_ids(lines)
 
         invoice_date = self._ceretax_get_document_date()
 
@@ -65,36 +67,44 @@ class CeretaxDocumentMixin(models.AbstractModel):
         except Exception:
             profile = {'profileId': 'sales', 'business_type': '01', 'customer_type': '01', 'unit_type':'01', 'seller_type':'01'}
 
+        # prefetch everything the line loop reads in a few batched queries
+        lines.mapped('product_id.categ_id.ceretax_ps_code_id.ps_code')
+        lines.mapped('price_subtotal')
+
+        ship_from = {
+            'addressLine1': comp.street or '',
+            'city': comp.city or '',
+            'state': comp.state_id.code or '',
+            'postalCode': comp.zip or '',
+            'country': comp.country_id.code or 'US',
+        }
+        ship_to = {
+            'addressLine1': partner.street or '',
+            'city': partner.city or '',
+            'state': partner.state_id.code or '',
+            'postalCode': partner.zip or '',
+            'country': partner.country_id.code or 'US',
+        }
+        unit_type = profile.get('unit_type') if profile else '01'
+
         line_items = []
 
         for line in lines:
             qty = float(self._ceretax_get_line_qty(line))
-            ps_code = getattr(line.product_id, 'ceretax_ps_code', None) or  line.product_id.categ_id.ceretax_ps_code_id.ps_code or settings_ps_code
-           
+            product = line.product_id
+            ps_code = getattr(product, 'ceretax_ps_code', None) or product.categ_id.ceretax_ps_code_id.ps_code or settings_ps_code
 
             line_items.append({
                 'lineId': line.ceretax_line_id,
                 'psCode': ps_code,
                 'revenue': float(line.price_subtotal or 0.0),
                 'units': {'quantity': qty,
-                         'type': profile.get('unit_type') if profile else '01'
+                         'type': unit_type
                          },
                 'dateOfTransaction': invoice_date,
                 'situs': {
-                    'shipFromAddress': {
-                        'addressLine1': comp.street or '',
-                        'city': comp.city or '',
-                        'state': comp.state_id.code or '',
-                        'postalCode': comp.zip or '',
-                        'country': comp.country_id.code or 'US',
-                    },
-                    'shipToAddress': {
-                        'addressLine1': partner.street or '',
-                        'city': partner.city or '',
-                        'state': partner.state_id.code or '',
-                        'postalCode': partner.zip or '',
-                        'country': partner.country_id.code or 'US',
-                    },
+                    'shipFromAddress': dict(ship_from),
+                    'shipToAddress': dict(ship_to),
                 },
             })
 
@@ -122,216 +132,385 @@ class CeretaxDocumentMixin(models.AbstractModel):
         }
         return payload
 
+    def _ceretax_assign_line_ids(self, lines):
+        """Number ``lines`` 1..n in ``ceretax_line_id`` with a single UPDATE
+        of the lines whose number changed."""
+        expected = {line.id: str(i) for i, line in enumerate(lines, start=1)}
+        changed = lines.filtered(lambda l: l.ceretax_line_id != expected[l.id])
+        if not changed:
+            return
+
+        changed.flush_recordset(['ceretax_line_id'])
+        self.env.cr.execute(
+            f"""
+            UPDATE "{changed._table}" AS l
+               SET ceretax_line_id = v.line_id
+              FROM unnest(%s::int[], %s::varchar[]) AS v(id, line_id)
+             WHERE l.id = v.id
+            """,
+            [changed.ids, [expected[line_id] for line_id in changed.ids]],
+        )
+        changed.invalidate_recordset(['ceretax_line_id'])
+
     # --------------------------------------------------------------------
     # SHARED: APPLY RESPONSE
     # --------------------------------------------------------------------
     def _apply_ceretax_response(self, resp):
         self.ensure_one()
         lines = self._ceretax_get_lines()
+        lines_by_id = {line.ceretax_line_id: line for line in lines}
+
+        items = []
+        for item in (resp.get("invoice") or {}).get("lineItems", []):
+            line = lines_by_id.get(str(item.get("lineId")))
+            if line:
+                items.append((line, item))
+        if not items:
+            return
+
+        for line, item in items:
+            line.write({
+                'ceretax_line_tax': float(item.get("totalTaxLine") or 0),
+                'ceretax_tax_details': json.dumps(item),
+            })
 
-        items = (resp.get("invoice") or {}).get("lineItems", [])
-        valid_ids = set(lines.mapped("ceretax_line_id"))
-        items = [i for i in items if str(i.get("lineId")) in valid_ids]
-
-        for item in items:
-            line_id = str(item.get("lineId"))
-            line = lines.filtered(lambda l: l.ceretax_line_id == line_id)
-            if not line:
-                continue
-
-            tax_amount = float(item.get("totalTaxLine") or 0)
-            line.ceretax_line_tax = tax_amount
-            line.ceretax_tax_details = json.dumps(item)
-
-            taxes = item.get('taxes') or []
+        # ----------------------------------------------------
+        # Sync CereTax tax lines (sale.order.line.tax / account.move.line.tax)
+        # ----------------------------------------------------
+        try:
+            with self.env.cr.savepoint():
+                self._ceretax_sync_tax_lines(items)
+        except Exception as e:
+            _logger.error("Failed creating/updating tax lines: %s", e)
+
+        # ----------------------------------------------------
+        # Assign account.tax records, one write per distinct tax set
+        # ----------------------------------------------------
+        lines_by_taxes = {}
+        for line, item in items:
             tax_ids = []
-
-            # ----------------------------------------------------
-            # Create CereTax tax lines in sale.order.line.tax
-            # ----------------------------------------------------
-            for t in taxes:
-                try:
-                    # rate_val = t.get('rate') or 0.0
-                    # rate = float(rate_val) * 100 if 0 < rate_val < 1 else float(rate_val)
-                    total_tax_val = round(float(t.get('totalTax') or 0.0), 2)
-
-                  # Pick correct tax storage model
-                    if line._name == "sale.order.line":
-                        TaxModel = self.env["sale.order.line.tax"]
-                        fk_name = "sale_line_id"
-                    else:
-                        TaxModel = self.env["account.move.line.tax"]
-                        fk_name = "move_line_id"
-
-                    domain = [
-                        (fk_name, '=', line.id),
-                        ('description', '=', t.get('description')),
-                        ('rate', '=', t.get('rate')),
-                        ('total_tax', '=', total_tax_val),
-                    ]
-
-                    existing = TaxModel.search(domain, limit=1)
-
-                    values = {
-                        fk_name: line.id,
-                        'description': t.get('description'),
-                        'tax_authority': t.get('taxAuthorityName'),
-                        'tax_level': t.get('taxLevelDesc'),
-                        'tax_type': t.get('taxTypeDesc'),
-                        'tax_class': t.get('taxTypeClassDesc'),
-                        'rate': t.get('rate') or 0.0,
-                        'calc_base': float(t.get('calculationBaseAmt') or 0.0),
-                        'total_tax': float(t.get('totalTax') or 0.0),
-                        'taxable': t.get('taxable'),
-                        'geocode': t.get('geocode', {}).get('geocode'),
-                        'extra': json.dumps(t),
-                        'tax_type_ref_desc': t.get('taxTypeRefDesc'),
-                        'exempt_amount': t.get('exemptAmount'),
-                        'percent_taxable': t.get('percentTaxable'),
-                        'non_taxable_amount': t.get('nonTaxableAmount'),
-                    }
-
-                    if existing:
-                        existing.write(values)
-                    else:
-                        TaxModel.create(values)
-
-                except Exception as e:
-                    _logger.error("Failed creating/updating tax line: %s", e)
-
-            for t in taxes:
-                name = t.get('description') or t.get('taxName') or 'CereTax'
-                raw_rate = t.get('rate') or t.get('percentage') or 0.0
-                try:
-                    rate = float(raw_rate)
-                except (TypeError, ValueError):
-                    rate = 0.0
-
-                if 0 < rate < 1:  # fractional rate like 0.06
-                    rate *= 100.0
-
-                rate = round(rate, 4)
-
-                tax = self.env['account.tax'].sudo().search([
-                    ('name', '=', name),
-                    ('type_tax_use', '=', 'sale')
-                ], limit=1)
-
-                if not tax or abs(tax.amount - rate) > 0.0001:
-                    # Ensure unique tax name
-                    Tax = self.env['account.tax'].sudo()
-                    company_id = self.company_id.id
-
-                    # Check all existing taxes with same base name
-                    existing = Tax.search([('name', '=', name), ('company_id', '=', company_id)])
-
-                    new_name = name
-
-                    if existing:
-                        # Find all taxes whose name starts with original name
-                        similar = Tax.search([
-                            ('name', 'ilike', f"{name}%"),
-                            ('company_id', '=', company_id)
-                        ])
-
-                        # Extract numeric suffixes e.g. TAX_2 → 2
-                        suffix_numbers = []
-                        for tax_rec in similar:
-                            parts = tax_rec.name.split('_')
-                            if len(parts) > 1 and parts[-1].isdigit():
-                                suffix_numbers.append(int(parts[-1]))
-
-                        next_number = (max(suffix_numbers) + 1) if suffix_numbers else 2
-                        new_name = f"{name}_{next_number}"
-
-                    # Create unique tax
-                    tax = Tax.create({
-                        'name': new_name,
-                        'amount': rate,
-                        'type_tax_use': 'sale',
-                    })
-
-                if not tax:
-                    try:
-                        tax = self.env['account.tax'].sudo().create({
-                            'name': name,
-                            'amount': rate,
-                            'amount_type': 'percent',
-                            'type_tax_use': 'sale',
-                            'price_include': False,
-                        })
-                    except:
-                        continue
-
-                tax_ids.append(tax.id)
-
-        if tax_ids:
+            for t in item.get('taxes') or []:
+                tax = self._ceretax_resolve_account_tax(t)
+                if tax:
+                    tax_ids.append(tax.id)
+            if tax_ids:
+                lines_by_taxes.setdefault(tuple(tax_ids), []).append(line.id)
+
+        if lines_by_taxes:
+            Line = self.env[lines._name].sudo()
             try:
-                # ensure taxes exist (we usually created them with sudo earlier)
-                tax_ids = [int(t) for t in tax_ids]
-
                 # Decide which field to write to: sale.order.line uses 'tax_id', account.move.line uses 'tax_ids'
-                if 'tax_id' in line._fields:
-                    # sale.order.line style
-                    line_sudo = line.sudo()
-                    line_sudo.tax_id = [(6, 0, tax_ids)]
-                    # recompute sale.order.line amounts if available
-                    if hasattr(line_sudo, '_compute_amount'):
-                        try:
-                            line_sudo._compute_amount()
-                        except Exception:
-                            # best effort: invalidate cache so UI shows changes
-                            self.invalidate_recordset()
-                            line_sudo.invalidate_cache()
-                elif 'tax_ids' in line._fields:
-                    # account.move.line style
-                    line_sudo = line.sudo()
-                    line_sudo.tax_ids = [(6, 0, tax_ids)]
-                    # account.move lines usually require recomputing at move level
-                    move = getattr(line_sudo, 'move_id', None)
-                    if move:
-                        # Try common recompute methods gracefully
-                        if hasattr(move, '_compute_amount'):
-                            try:
-                                move._compute_amount()
-                            except Exception:
-                                # Some account.move versions use other names; try generic invalidation
-                                move.invalidate_cache()
-                        else:
-                            move.invalidate_cache()
-                    else:
-                        # fallback: try line recompute if present
-                        if hasattr(line_sudo, '_compute_amount'):
-                            try:
-                                line_sudo._compute_amount()
-                            except Exception:
-                                line_sudo.invalidate_cache()
+                if 'tax_id' in Line._fields:
+                    tax_field = 'tax_id'
+                elif 'tax_ids' in Line._fields:
+                    tax_field = 'tax_ids'
                 else:
-                    _logger.warning("No tax field found on %s (id=%s). Cannot set taxes.", line._name, line.id)
+                    _logger.warning("No tax field found on %s. Cannot set taxes.", Line._name)
+                    return
+
+                for tax_ids, line_ids in lines_by_taxes.items():
+                    Line.browse(line_ids).write({tax_field: [(6, 0, list(tax_ids))]})
+
+                # account.move lines usually require recomputing at move level
+                move = self if self._name == 'account.move' else None
+                if move and hasattr(move, '_compute_amount'):
+                    try:
+                        move.sudo()._compute_amount()
+                    except Exception:
+                        # Some account.move versions use other names; try generic invalidation
+                        move.invalidate_recordset()
             except Exception as e:
-                _logger.exception("Failed to assign taxes to %s (id=%s): %s", line._name, getattr(line, 'id', False), e)
+                _logger.exception("Failed to assign taxes to %s: %s", Line._name, e)
+
+    def _ceretax_sync_tax_lines(self, items):
+        """Reconcile the stored CereTax tax rows of the lines in ``items``.
+
+        Existing rows are loaded in one query and matched in memory on
+        (line, description, rate, total); unchanged rows are kept, changed
+        ones rewritten with a single UPDATE, new ones created in one batch
+        and rows no longer returned by CereTax removed in one batch.
+        """
+        if items[0][0]._name == "sale.order.line":
+            TaxModel = self.env["sale.order.line.tax"]
+            fk_name = "sale_line_id"
+        else:
+            TaxModel = self.env["account.move.line.tax"]
+            fk_name = "move_line_id"
+
+        def key(line_id, description, rate, total_tax):
+            return (line_id, description or False, round(float(rate or 0.0), 6), round(float(total_tax or 0.0), 2))
+
+        existing = {}
+        line_ids = [line.id for line, item in items]
+        for rec in TaxModel.search([(fk_name, 'in', line_ids)]):
+            existing.setdefault(key(rec[fk_name].id, rec.description, rec.rate, rec.total_tax), []).append(rec)
+
+        to_create = []
+        to_write = []
+        kept = set()
+        for line, item in items:
+            for t in item.get('taxes') or []:
+                extra = json.dumps(t)
+                values = {
+                    fk_name: line.id,
+                    'description': t.get('description'),
+                    'tax_authority': t.get('taxAuthorityName'),
+                    'tax_level': t.get('taxLevelDesc'),
+                    'tax_type': t.get('taxTypeDesc'),
+                    'tax_class': t.get('taxTypeClassDesc'),
+                    'rate': t.get('rate') or 0.0,
+                    'calc_base': float(t.get('calculationBaseAmt') or 0.0),
+                    'total_tax': float(t.get('totalTax') or 0.0),
+                    'taxable': t.get('taxable'),
+                    'geocode': (t.get('geocode') or {}).get('geocode'),
+                    'extra': extra,
+                    'tax_type_ref_desc': t.get('taxTypeRefDesc'),
+                    'exempt_amount': t.get('exemptAmount'),
+                    'percent_taxable': t.get('percentTaxable'),
+                    'non_taxable_amount': t.get('nonTaxableAmount'),
+                }
+
+                candidates = existing.get(key(line.id, t.get('description'), t.get('rate'), t.get('totalTax')))
+                if candidates:
+                    rec = candidates.pop(0)
+                    kept.add(rec.id)
+                    if rec.extra != extra:
+                        # the line is part of the match key: only the details changed
+                        to_write.append((rec.id, values))
+                else:
+                    to_create.append(values)
+
+        if to_write:
+            self._ceretax_update_tax_rows(TaxModel, fk_name, to_write)
+
+        stale = TaxModel.browse([
+            rec.id for recs in existing.values() for rec in recs if rec.id not in kept
+        ])
+        if stale:
+            stale.unlink()
+        if to_create:
+            TaxModel.create(to_create)
+
+    def _ceretax_update_tax_rows(self, TaxModel, fk_name, rows):
+        """Rewrite the CereTax tax rows ``rows``, a list of ``(id, values)``,
+        with a single UPDATE."""
+        fields_ = [TaxModel._fields[name] for name in rows[0][1] if name != fk_name]
+        TaxModel.flush_model([field.name for field in fields_])
+        columns = [[row_id for row_id, _values in rows], [self.env.uid] * len(rows)] + [
+            [field.convert_to_column(values[field.name], TaxModel) for _row_id, values in rows]
+            for field in fields_
+        ]
+        self.env.cr.execute(
+            f"""
+            UPDATE "{TaxModel._table}" AS t
+               SET write_uid = v.write_uid, write_date = (now() at time zone 'UTC'),
+                   {", ".join(f'"{field.name}" = v."{field.name}"' for field in fields_)}
+              FROM unnest(%s::int[], %s::int[], {", ".join(f"%s::{field.column_type[1]}[]" for field in fields_)})
+                   AS v(id, write_uid, {", ".join(f'"{field.name}"' for field in fields_)})
+             WHERE t.id = v.id
+            """,
+            columns,
+        )
+        TaxModel.browse(columns[0]).invalidate_recordset(
+            [field.name for field in fields_] + ['write_uid', 'write_date'])
+
+    def _ceretax_resolve_account_tax(self, t):
+        """Return the sale ``account.tax`` matching CereTax tax entry ``t``."""
+        name = t.get('description') or t.get('taxName') or 'CereTax'
+        raw_rate = t.get('rate') or t.get('percentage') or 0.0
+        try:
+            rate = float(raw_rate)
+        except (TypeError, ValueError):
+            rate = 0.0
 
+        if 0 < rate < 1:  # fractional rate like 0.06
+            rate *= 100.0
 
-        
+        return self.env['account.tax']._ceretax_resolve(self.company_id, name, rate)
 
     # --------------------------------------------------------------------
     # SHARED ACTION
     # --------------------------------------------------------------------
     def action_ceretax_calculate(self):
+        if len(self) > 1:
+            results = self._ceretax_calculate_bulk()
+            return self._ceretax_bulk_notification(results)
+
+        cache = self.env['ceretax.calc.cache']
+        metrics = []
         for doc in self:
+            started, sql_count = time.perf_counter(), self.env.cr.sql_log_count
             payload = doc._build_ceretax_payload()
+            metric = {"build_ms": elapsed_ms(time.perf_counter() - started)}
             api = self.env['ceretax.api.mixin']
 
+            if cache._ceretax_lookup(doc, payload):
+                metrics.append(doc._ceretax_metric_vals(payload, metric, started, sql_count, cache_hit=True))
+                continue
+
             try:
-                resp_http = api._ceretax_request('post', 'sale', payload, doc, None)
+                resp_http = api._ceretax_request('post', 'sale', payload, doc, None, metrics=metric)
+                parse_started = time.perf_counter()
                 result = resp_http.json()
+                metric["parse_ms"] = elapsed_ms(time.perf_counter() - parse_started)
             except Exception as e:
                 raise UserError(_("CereTax API failed: %s") % e)
 
+            apply_started = time.perf_counter()
             doc._apply_ceretax_response(result)
+            cache._ceretax_store(doc, payload, resp_http.text)
+            metric["apply_ms"] = elapsed_ms(time.perf_counter() - apply_started)
+            metrics.append(doc._ceretax_metric_vals(payload, metric, started, sql_count))
 
+        self.env['ceretax.calc.metric']._ceretax_record(metrics)
         return True
 
+    def _ceretax_metric_vals(self, payload, metric, started, sql_count, **vals):
+        """Complete the phase timings of a calculation of ``self`` into
+        ``ceretax.calc.metric`` values.
+
+        :param started: ``time.perf_counter()`` when the calculation started
+        :param sql_count: ``cr.sql_log_count`` when the calculation started
+        """
+        self.ensure_one()
+        return dict(
+            metric,
+            res_model=self._name,
+            res_id=self.id,
+            document_name=self.display_name,
+            line_count=len(payload['invoice']['lineItems']),
+            sql_count=self.env.cr.sql_log_count - sql_count,
+            total_ms=elapsed_ms(time.perf_counter() - started),
+            **vals,
+        )
+
+    def _ceretax_calculate_bulk(self, concurrency=None):
+        """Calculate taxes of several documents with overlapping API calls.
+
+        Payloads are built up front, sent by a bounded thread pool and the
+        responses applied back here, in the order of ``self``. A failing
+        document does not stop the others.
+
+        :return: dict mapping each document id to ``False`` on success or
+                 to the error message on failure
+        """
+        api = self.env['ceretax.api.mixin']
+        cache = self.env['ceretax.calc.cache']
+        results = {}
+        prepared = []
+        metrics = []
+
+        for doc in self:
+            started, sql_count = time.perf_counter(), self.env.cr.sql_log_count
+            try:
+                # a failed build must not leave its line id writes behind
+                with self.env.cr.savepoint():
+                    payload = doc._build_ceretax_payload()
+                build_ms = elapsed_ms(time.perf_counter() - started)
+                if cache._ceretax_lookup(doc, payload):
+                    results[doc.id] = False
+                    metrics.append(doc._ceretax_metric_vals(
+                        payload, {"build_ms": build_ms}, started, sql_count, cache_hit=True, bulk=True))
+                    continue
+                request = api._ceretax_prepare_request('post', 'sale', payload)
+                request["timings"]["build_ms"] = build_ms
+                request["started"] = started
+                request["build_sql_count"] = self.env.cr.sql_log_count - sql_count
+                prepared.append((doc, payload, request))
+            except Exception as e:
+                results[doc.id] = str(e)
+
+        if prepared:
+            workers = min(concurrency or api._ceretax_bulk_concurrency(), len(prepared))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ceretax") as pool:
+                futures = []
+                for doc, payload, request in prepared:
+                    request["submitted_at"] = time.perf_counter()
+                    futures.append(pool.submit(api._ceretax_send, request))
+
+                for (doc, payload, request), future in zip(prepared, futures):
+                    # count the queries of the build phase and of the apply
+                    # phase, not those of the documents applied in between
+                    started = request["started"]
+                    sql_count = self.env.cr.sql_log_count - request["build_sql_count"]
+                    metric = request["timings"]
+                    try:
+                        resp_http = future.result()
+                    except Exception as e:
+                        results[doc.id] = _("Failed to connect to CereTax: %s") % e
+                        metrics.append(doc._ceretax_metric_vals(
+                            payload, metric, started, sql_count, failed=True, bulk=True))
+                        continue
+
+                    try:
+                        api._ceretax_finish_request(request, resp_http, doc, None)
+                        parse_started = time.perf_counter()
+                        result = resp_http.json()
+                        metric["parse_ms"] = elapsed_ms(time.perf_counter() - parse_started)
+                        apply_started = time.perf_counter()
+                        with self.env.cr.savepoint():
+                            doc._apply_ceretax_response(result)
+                            cache._ceretax_store(doc, payload, resp_http.text)
+                        metric["apply_ms"] = elapsed_ms(time.perf_counter() - apply_started)
+                    except Exception as e:
+                        results[doc.id] = _("CereTax API failed: %s") % e
+                        metrics.append(doc._ceretax_metric_vals(
+                            payload, metric, started, sql_count, failed=True, bulk=True))
+                        continue
+
+                    results[doc.id] = False
+                    metrics.append(doc._ceretax_metric_vals(payload, metric, started, sql_count, bulk=True))
+
+        self.env['ceretax.calc.metric']._ceretax_record(metrics)
+
+        for doc in self:
+            if results.get(doc.id):
+                _logger.warning("CereTax calculation failed for %s: %s",
+                                doc.display_name, results[doc.id])
+
+        return results
+
+    def action_ceretax_calculate_background(self):
+        """Queue the selected documents in a background calculation job."""
+        job = self.env['ceretax.calc.job']._ceretax_enqueue(self)
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("CereTax Tax Calculation"),
+                "message": _("%s document(s) queued for calculation.", len(self)),
+                "type": "info",
+                "next": {
+                    "type": "ir.actions.act_window",
+                    "res_model": "ceretax.calc.job",
+                    "res_id": job.id,
+                    "views": [(False, "form")],
+                },
+            },
+        }
+
+    def _ceretax_bulk_notification(self, results):
+        failed = self.filtered(lambda d: results.get(d.id))
+        message = _("%(done)s document(s) calculated, %(failed)s failed.",
+                    done=len(self) - len(failed), failed=len(failed))
+        if failed:
+            message += "\n" + "\n".join(
+                f"{doc.display_name}: {results[doc.id]}" for doc in failed[:10])
+            if len(failed) > 10:
+                message += "\n" + _("... and %s more.", len(failed) - 10)
+
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("CereTax Tax Calculation"),
+                "message": message,
+                "type": "warning" if failed else "success",
+                "sticky": bool(failed),
+                "next": {"type": "ir.actions.client", "tag": "reload"},
+            },
+        }
+
     def _ceretax_get_line_qty(self, line):
         """Return quantity for both SO lines and invoice lines."""
         if hasattr(line, "quantity"):
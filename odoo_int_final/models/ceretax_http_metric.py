@@ -0,0 +1,185 @@
+from odoo import models, fields, api, sql_db
+import atexit
+import collections
+import logging
+import threading
+import time
+
+from .ceretax_log_buffer import log_buffer
+
+_logger = logging.getLogger(__name__)
+
+# upper bounds of the latency histogram, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+INF = "+Inf"
+FLUSH_INTERVAL = 10.0
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+LOG_TABLES = ("ceretax_transaction", "ceretax_transaction_body", "ceretax_calc_metric")
+
+
+def bucket_label(seconds):
+    for bound in BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return INF
+
+
+class MetricsCollector:
+    """In-process request counters, merged into ``ceretax_http_metric``.
+
+    Observations only update a dict under a lock. Every
+    ``FLUSH_INTERVAL`` seconds the caller that notices it swaps the dict
+    out and adds it to the shared table with one upsert, so every worker
+    contributes to the same totals. Like the transport, it never touches
+    the ORM and may be used from helper threads.
+    """
+
+    def __init__(self, interval=FLUSH_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # dbname -> {(endpoint, status, le): [count, duration sum]}
+        self._pending = collections.defaultdict(dict)
+        self._flushed_at = time.monotonic()
+
+    def observe(self, dbname, endpoint, status, seconds):
+        key = (endpoint or "other", str(status), bucket_label(seconds))
+        with self._lock:
+            counter = self._pending[dbname].setdefault(key, [0, 0.0])
+            counter[0] += 1
+            counter[1] += seconds
+            due = time.monotonic() - self._flushed_at >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, collections.defaultdict(dict)
+            self._flushed_at = time.monotonic()
+        for dbname, counters in pending.items():
+            if not counters:
+                continue
+            try:
+                with sql_db.db_connect(dbname).cursor() as cr:
+                    cr.execute("""
+                        INSERT INTO ceretax_http_metric (endpoint, status, le, count, duration_sum)
+                        SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[],
+                                             %s::int[], %s::float8[])
+                        ON CONFLICT (endpoint, status, le) DO UPDATE
+                           SET count = ceretax_http_metric.count + EXCLUDED.count,
+                               duration_sum = ceretax_http_metric.duration_sum + EXCLUDED.duration_sum
+                    """, [
+                        [key[0] for key in counters],
+                        [key[1] for key in counters],
+                        [key[2] for key in counters],
+                        [value[0] for value in counters.values()],
+                        [value[1] for value in counters.values()],
+                    ])
+            except Exception:
+                # counters are best effort, losing one interval is acceptable
+                _logger.debug("ceretax: could not flush request metrics", exc_info=True)
+
+
+metrics = MetricsCollector()
+atexit.register(metrics.flush)
+
+
+class CeretaxHttpMetric(models.Model):
+    _name = "ceretax.http.metric"
+    _description = "CereTax Request Counters"
+    _log_access = False
+
+    endpoint = fields.Char(required=True, readonly=True)
+    status = fields.Char(required=True, readonly=True,
+                         help="HTTP status code, or the reason the call did not complete.")
+    le = fields.Char(string="Bucket", required=True, readonly=True,
+                     help="Latency bucket upper bound in seconds; counts are not cumulative.")
+    count = fields.Integer(readonly=True, default=0)
+    duration_sum = fields.Float(readonly=True, default=0.0)
+
+    _sql_constraints = [
+        ("bucket_uniq", "unique(endpoint, status, le)", "One counter per endpoint, status and bucket."),
+    ]
+
+    @api.model
+    def _ceretax_prometheus(self):
+        """Render the integration health in the Prometheus text format."""
+        metrics.flush()
+        cr = self.env.cr
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name, value, **labels):
+            label_text = ",".join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        cr.execute("SELECT endpoint, status, le, count, duration_sum FROM ceretax_http_metric")
+        series = collections.defaultdict(dict)
+        for endpoint, status, le, count, duration_sum in cr.fetchall():
+            series[endpoint, status][le] = (count, duration_sum)
+
+        metric("ceretax_requests_total", "counter", "CereTax API calls by endpoint family and status.")
+        for (endpoint, status), buckets in sorted(series.items()):
+            sample("ceretax_requests_total", sum(c for c, _s in buckets.values()),
+                   endpoint=endpoint, status=status)
+
+        metric("ceretax_request_duration_seconds", "histogram", "CereTax API call latency, retries included.")
+        for (endpoint, status), buckets in sorted(series.items()):
+            cumulative = 0
+            for bound in [str(b) for b in BUCKETS] + [INF]:
+                cumulative += buckets.get(bound, (0, 0.0))[0]
+                sample("ceretax_request_duration_seconds_bucket", cumulative,
+                       endpoint=endpoint, status=status, le=bound)
+            sample("ceretax_request_duration_seconds_sum", sum(s for _c, s in buckets.values()),
+                   endpoint=endpoint, status=status)
+            sample("ceretax_request_duration_seconds_count", cumulative, endpoint=endpoint, status=status)
+
+        hits, lookups = self.env["ceretax.calc.cache"]._ceretax_hit_rate()
+        metric("ceretax_calc_cache_hits_total", "counter", "Calculations answered from the cache.")
+        sample("ceretax_calc_cache_hits_total", hits)
+        metric("ceretax_calc_cache_lookups_total", "counter", "Calculation cache lookups.")
+        sample("ceretax_calc_cache_lookups_total", lookups)
+        metric("ceretax_calc_cache_hit_ratio", "gauge", "Share of cache lookups that were hits.")
+        sample("ceretax_calc_cache_hit_ratio", round(hits / lookups, 4) if lookups else 0)
+
+        cr.execute("SELECT host, state, trip_count FROM ceretax_circuit_breaker ORDER BY host")
+        breakers = cr.fetchall()
+        metric("ceretax_circuit_breaker_state", "gauge", "0 closed, 1 half-open, 2 open.")
+        for host, state, _trips in breakers:
+            sample("ceretax_circuit_breaker_state", BREAKER_STATES.get(state, 0), host=host)
+        metric("ceretax_circuit_breaker_trips_total", "counter", "Times the breaker opened.")
+        for host, _state, trips in breakers:
+            sample("ceretax_circuit_breaker_trips_total", trips or 0, host=host)
+
+        cr.execute("SELECT budget, delayed_count FROM ceretax_rate_limit ORDER BY budget")
+        metric("ceretax_rate_limit_delayed_total", "counter", "Calls queued by the rate limiter.")
+        for budget, delayed in cr.fetchall():
+            sample("ceretax_rate_limit_delayed_total", delayed or 0, budget=budget)
+
+        cr.execute("SELECT count(*) FROM ceretax_status_outbox WHERE state = 'pending'")
+        metric("ceretax_status_outbox_pending", "gauge", "Invoice status changes waiting to be sent.")
+        sample("ceretax_status_outbox_pending", cr.fetchone()[0])
+
+        cr.execute("""
+            SELECT job.state, count(*)
+              FROM ceretax_calc_job_line line
+              JOIN ceretax_calc_job job ON job.id = line.job_id
+             WHERE line.state = 'pending' AND job.state IN ('queued', 'running', 'paused')
+          GROUP BY job.state
+        """)
+        pending_lines = dict(cr.fetchall())
+        metric("ceretax_calc_job_lines_pending", "gauge", "Documents waiting in bulk calculation jobs, by job state.")
+        for job_state in ("queued", "running", "paused"):
+            sample("ceretax_calc_job_lines_pending", pending_lines.get(job_state, 0), job_state=job_state)
+
+        metric("ceretax_log_buffer_dropped_total", "counter", "Log entries dropped by the serving worker.")
+        sample("ceretax_log_buffer_dropped_total", log_buffer.dropped)
+
+        metric("ceretax_table_size_bytes", "gauge", "Disk size of the CereTax log tables, indexes and TOAST included.")
+        for table in LOG_TABLES:
+            cr.execute("SELECT pg_total_relation_size(to_regclass(%s))", [table])
+            sample("ceretax_table_size_bytes", cr.fetchone()[0] or 0, table=table)
+
+        return "\n".join(lines) + "\n"
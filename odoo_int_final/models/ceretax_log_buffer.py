@@ -0,0 +1,132 @@
+import atexit
+import collections
+import functools
+import logging
+import threading
+
+from odoo import api, fields
+
+_logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "ceretax.transaction.buffer"
+# fields referencing rows that may vanish with a rolled back transaction
+ROLLBACK_UNSAFE_FIELDS = ("partner_id", "sale_order_id", "sale_line_id")
+
+
+class LogBuffer:
+    """Process-wide buffer of ``ceretax.transaction`` rows.
+
+    Entries are attached to the business transaction and handed to the
+    buffer once it commits or rolls back, so the log of a failed
+    calculation is kept. A daemon thread writes them in batches on its own
+    cursor, at the latest ``max_delay`` seconds after they were queued.
+    When more than ``max_size`` entries are waiting the oldest are dropped
+    rather than slowing down the request path.
+    """
+
+    def __init__(self, max_size=1000, max_delay=2.0, batch_size=100):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def configure(self, max_size=None, max_delay=None, batch_size=None):
+        self.max_size = max_size or self.max_size
+        self.max_delay = max_delay or self.max_delay
+        self.batch_size = batch_size or self.batch_size
+
+    def add(self, cr, uid, vals):
+        """Attach a log row to the transaction of ``cr``.
+
+        The row is stamped now, not when the buffer gets to write it.
+        """
+        vals = dict(vals, timestamp=vals.get("timestamp") or fields.Datetime.now())
+        entries = cr.postcommit.data.get(BUFFER_KEY)
+        if entries is None:
+            entries = cr.postcommit.data[BUFFER_KEY] = []
+            cr.postrollback.data[BUFFER_KEY] = entries
+            cr.postcommit.add(functools.partial(self._enqueue, cr.dbname, entries, False))
+            cr.postrollback.add(functools.partial(self._enqueue, cr.dbname, entries, True))
+        entries.append((uid, vals))
+
+    def _enqueue(self, dbname, entries, rolled_back):
+        with self._cond:
+            for uid, vals in entries:
+                if rolled_back:
+                    vals = {k: v for k, v in vals.items() if k not in ROLLBACK_UNSAFE_FIELDS}
+                self._queue.append((dbname, uid, vals))
+            overflow = len(self._queue) - self.max_size
+            for _i in range(max(overflow, 0)):
+                self._queue.popleft()
+                self.dropped += 1
+            if overflow > 0:
+                _logger.warning("ceretax: log buffer full, dropped %s entries", overflow)
+            self._ensure_thread()
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ceretax.log.buffer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._queue) < self.batch_size:
+                    self._cond.wait(self.max_delay)
+            self.flush()
+
+    def _pop_batch(self):
+        with self._cond:
+            return [self._queue.popleft() for _i in range(min(self.batch_size, len(self._queue)))]
+
+    def flush(self):
+        """Write every queued entry, one batch per database and user."""
+        from odoo.modules.registry import Registry
+
+        while True:
+            batch = self._pop_batch()
+            if not batch:
+                return
+            groups = collections.defaultdict(list)
+            for dbname, uid, vals in batch:
+                groups[dbname, uid].append(vals)
+            for (dbname, uid), vals_list in groups.items():
+                try:
+                    with Registry(dbname).cursor() as cr:
+                        env = api.Environment(cr, uid, {})
+                        env["ceretax.transaction"].sudo().create(vals_list)
+                except Exception:
+                    _logger.warning("ceretax: could not write %s log entries at once, retrying one by one",
+                                    len(vals_list), exc_info=True)
+                    self._write_one_by_one(Registry(dbname), uid, vals_list)
+
+    def _write_one_by_one(self, registry, uid, vals_list):
+        """Write each entry in its own savepoint of a fresh cursor, so a
+        faulty entry does not take the rest of its batch down with it."""
+        failed = 0
+        try:
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, {})
+                for vals in vals_list:
+                    try:
+                        with cr.savepoint():
+                            env["ceretax.transaction"].sudo().create(vals)
+                    except Exception:
+                        failed += 1
+                        _logger.exception("ceretax: could not write log entry %s", vals.get("name"))
+        except Exception:
+            _logger.exception("ceretax: could not write %s log entries", len(vals_list))
+            return
+        if failed:
+            _logger.warning("ceretax: dropped %s of %s log entries", failed, len(vals_list))
+
+log_buffer = LogBuffer()
+atexit.register(log_buffer.flush)
@@ -0,0 +1,158 @@
+from odoo import models, fields, api, _
+from datetime import datetime, time as dt_time, timedelta
+import logging
+import time
+
+from .ceretax_rate_limit import BUDGETS
+
+_logger = logging.getLogger(__name__)
+
+ROLLUP_CHECKPOINT = "ceretax.log_rollup_until"
+# a log entry is an error when CereTax answered with a 4xx/5xx status
+ERROR_CONDITION = "COALESCE(status_code, 0) >= 400"
+
+
+class CeretaxLogRetention(models.Model):
+    _name = "ceretax.log.retention"
+    _description = "CereTax Log Retention Rule"
+    _order = "sequence, id"
+
+    sequence = fields.Integer(default=10)
+    active = fields.Boolean(default=True)
+    endpoint_family = fields.Selection(BUDGETS, help="Leave empty to apply to every endpoint family.")
+    status = fields.Selection([
+        ("any", "Any"),
+        ("success", "Successful"),
+        ("error", "Errors"),
+    ], required=True, default="any")
+    max_age_days = fields.Integer(string="Keep Days", help="Delete entries older than this. 0 keeps them.")
+    max_rows = fields.Integer(string="Keep Rows", help="Only keep the newest entries. 0 means no limit.")
+
+    def _ceretax_domain(self):
+        self.ensure_one()
+        domain = []
+        if self.endpoint_family:
+            domain.append(("endpoint_family", "=", self.endpoint_family))
+        if self.status == "success":
+            domain.append("|")
+            domain.append(("status_code", "=", False))
+            domain.append(("status_code", "<", 400))
+        elif self.status == "error":
+            domain.append(("status_code", ">=", 400))
+        return domain
+
+    def _ceretax_prune_domains(self, rolled_up_until):
+        """Return the domains of the log entries each rule allows to delete.
+
+        Only entries of days already rolled up are ever returned, so the
+        daily statistics are complete before any raw entry disappears.
+        """
+        Transaction = self.env["ceretax.transaction"].sudo()
+        domains = []
+        for rule in self:
+            base = rule._ceretax_domain() + [("timestamp", "<", rolled_up_until)]
+            if rule.max_age_days > 0:
+                limit = fields.Datetime.now() - timedelta(days=rule.max_age_days)
+                domains.append(base + [("timestamp", "<", limit)])
+            if rule.max_rows > 0:
+                newest = Transaction.search(
+                    rule._ceretax_domain(), order="id desc", offset=rule.max_rows, limit=1)
+                if newest:
+                    domains.append(base + [("id", "<=", newest.id)])
+        return domains
+
+    @api.model
+    def _cron_ceretax_log_retention(self, chunk_size=1000, time_budget=90):
+        """Roll up the finished days of the log, then prune it in chunks.
+
+        Every chunk is deleted through the ORM, removing the compressed
+        bodies with it, and committed on its own so the log table is never
+        locked for long. The cron triggers itself again when the time
+        budget is exhausted.
+        """
+        rolled_up_until = self.env["ceretax.transaction.rollup"]._ceretax_rollup()
+        self.env["ceretax.calc.metric"]._ceretax_prune()
+        self.env.cr.commit()
+
+        Transaction = self.env["ceretax.transaction"].sudo()
+        started = time.monotonic()
+        deleted = 0
+        for domain in self.search([])._ceretax_prune_domains(rolled_up_until):
+            while True:
+                records = Transaction.search(domain, order="id", limit=chunk_size)
+                if not records:
+                    break
+                records.unlink()
+                self.env.cr.commit()
+                deleted += len(records)
+
+                if time.monotonic() - started > time_budget:
+                    _logger.info("ceretax: pruned %s log entries, continuing later", deleted)
+                    self.env.ref("odoo_int_final.ir_cron_ceretax_log_retention")._trigger()
+                    return
+        _logger.info("ceretax: pruned %s log entries", deleted)
+
+
+class CeretaxTransactionRollup(models.Model):
+    _name = "ceretax.transaction.rollup"
+    _description = "CereTax Daily Log Rollup"
+    _order = "day desc, endpoint_family"
+    _rec_name = "day"
+
+    day = fields.Date(required=True, readonly=True, index=True)
+    endpoint_family = fields.Selection(BUDGETS, readonly=True)
+    call_count = fields.Integer(string="Calls", readonly=True, aggregator="sum")
+    error_count = fields.Integer(string="Errors", readonly=True, aggregator="sum")
+    duration_avg = fields.Float(string="Average (ms)", readonly=True, aggregator="avg")
+    duration_p50 = fields.Float(string="p50 (ms)", readonly=True, aggregator="max")
+    duration_p95 = fields.Float(string="p95 (ms)", readonly=True, aggregator="max")
+    duration_p99 = fields.Float(string="p99 (ms)", readonly=True, aggregator="max")
+
+    _sql_constraints = [
+        ("day_family_uniq", "unique(day, endpoint_family)", "One rollup per day and endpoint family."),
+    ]
+
+    @api.model
+    def _ceretax_rollup(self):
+        """Aggregate every finished day not rolled up yet.
+
+        :return: the start of the current day (UTC); entries before it are
+                 covered by a rollup
+        """
+        icp = self.env["ir.config_parameter"].sudo()
+        until = datetime.combine(fields.Date.today(), dt_time.min)
+        since = icp.get_param(ROLLUP_CHECKPOINT)
+        if since:
+            since = fields.Datetime.to_datetime(since)
+        else:
+            self.env.cr.execute("SELECT min(timestamp) FROM ceretax_transaction")
+            oldest = self.env.cr.fetchone()[0]
+            since = datetime.combine(oldest.date(), dt_time.min) if oldest else until
+        if since >= until:
+            return until
+
+        # entries without a family roll up under a NULL key, which a unique
+        # constraint cannot match on conflict: replace the range instead
+        self.env.cr.execute("""
+            DELETE FROM ceretax_transaction_rollup WHERE day >= %(since)s AND day < %(until)s
+        """, {"since": since.date(), "until": until.date()})
+        self.env.cr.execute(f"""
+            INSERT INTO ceretax_transaction_rollup
+                   (day, endpoint_family, call_count, error_count, duration_avg,
+                    duration_p50, duration_p95, duration_p99,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT timestamp::date, endpoint_family, count(*),
+                   count(*) FILTER (WHERE {ERROR_CONDITION}),
+                   avg(duration_ms),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms),
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms),
+                   percentile_cont(0.99) WITHIN GROUP (ORDER BY duration_ms),
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM ceretax_transaction
+             WHERE timestamp >= %(since)s AND timestamp < %(until)s
+          GROUP BY timestamp::date, endpoint_family
+        """, {"uid": self.env.uid, "since": since, "until": until})
+        _logger.info("ceretax: rolled up %s day/family log aggregates", self.env.cr.rowcount)
+        icp.set_param(ROLLUP_CHECKPOINT, fields.Datetime.to_string(until))
+        self.env.invalidate_all()
+        return until
@@ -0,0 +1,130 @@
+from odoo import models, fields, api, sql_db, _
+import logging
+import threading
+import time
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+# seconds of quota a process claims per round trip
+PREFETCH_SECONDS = 0.5
+
+# endpoint families sharing one CereTax quota budget
+BUDGETS = [
+    ("calc", "Tax Calculation"),
+    ("av", "Address Validation"),
+    ("data", "Data Lookups"),
+    ("status", "Status Updates"),
+]
+
+
+class RateLimitError(requests.exceptions.RequestException):
+    """Raised when no token could be obtained within the allowed wait."""
+
+
+class RateLimiter:
+    """Token buckets shared by all workers of a database.
+
+    Each budget is a row of ``ceretax_rate_limit`` refilled at ``rate``
+    tokens per second up to ``burst``. A process claims up to
+    ``PREFETCH_SECONDS`` worth of tokens per round trip and hands them out
+    locally; unused tokens lapse after that delay so that a worker does not
+    hold back capacity the others could use. Callers sleep outside of any
+    transaction until a token is due.
+    """
+
+    def __init__(self, dbname, limits=None, max_wait=10.0):
+        self.dbname = dbname
+        # budget -> (rate per second, burst); a rate <= 0 disables the bucket
+        self.limits = dict(limits or {})
+        self.max_wait = max_wait
+        # budget -> [tokens claimed by this process, monotonic expiry]
+        self._reserve = {}
+        self._lock = threading.Lock()
+
+    def _take_local(self, budget):
+        with self._lock:
+            reserve = self._reserve.get(budget)
+            if reserve and reserve[0] >= 1 and reserve[1] > time.monotonic():
+                reserve[0] -= 1
+                return True
+        return False
+
+    def acquire(self, budget):
+        rate, burst = self.limits.get(budget, (0, 0))
+        if rate <= 0:
+            return 0.0
+        burst = max(burst, 1)
+        claim = max(1, min(int(burst), int(rate * PREFETCH_SECONDS)))
+
+        waited = 0.0
+        while True:
+            if self._take_local(budget):
+                return waited
+            try:
+                granted, wait = self._take(budget, rate, burst, claim)
+            except Exception:
+                # never let the bookkeeping block the actual call
+                _logger.debug("ceretax: rate limiter unavailable", exc_info=True)
+                return waited
+            if granted:
+                with self._lock:
+                    self._reserve[budget] = [granted - 1, time.monotonic() + PREFETCH_SECONDS]
+                return waited
+            if waited + wait > self.max_wait:
+                raise RateLimitError(
+                    _("CereTax rate limit for %s reached, no capacity within %s s.") % (budget, self.max_wait))
+            time.sleep(wait)
+            waited += wait
+
+    def _take(self, budget, rate, burst, claim):
+        """Take up to ``claim`` whole tokens.
+
+        :return: ``(tokens granted, seconds until the next token)``
+        """
+        with sql_db.db_connect(self.dbname).cursor() as cr:
+            cr.execute("""
+                INSERT INTO ceretax_rate_limit (budget, tokens, refilled_at, granted_count, delayed_count)
+                VALUES (%s, %s, clock_timestamp() AT TIME ZONE 'UTC', 0, 0)
+                ON CONFLICT (budget) DO NOTHING
+            """, [budget, burst])
+            cr.execute("""
+                SELECT LEAST(%s, tokens + %s * EXTRACT(EPOCH FROM
+                       (clock_timestamp() AT TIME ZONE 'UTC') - refilled_at))
+                  FROM ceretax_rate_limit
+                 WHERE budget = %s
+                   FOR UPDATE
+            """, [burst, rate, budget])
+            tokens = float(cr.fetchone()[0])
+            granted = min(claim, int(tokens))
+            cr.execute("""
+                UPDATE ceretax_rate_limit
+                   SET tokens = %s, refilled_at = clock_timestamp() AT TIME ZONE 'UTC',
+                       granted_count = granted_count + %s, delayed_count = delayed_count + %s
+                 WHERE budget = %s
+            """, [tokens - granted, granted, int(not granted), budget])
+        return granted, 0.0 if granted else (1 - tokens) / rate
+
+
+class CeretaxRateLimit(models.Model):
+    _name = "ceretax.rate.limit"
+    _description = "CereTax Rate Limit Bucket"
+    _rec_name = "budget"
+    _order = "budget"
+
+    budget = fields.Selection(BUDGETS, required=True, readonly=True)
+    tokens = fields.Float(readonly=True)
+    refilled_at = fields.Datetime(readonly=True)
+    granted_count = fields.Integer(readonly=True, default=0)
+    delayed_count = fields.Integer(readonly=True, default=0)
+
+    _sql_constraints = [
+        ("budget_uniq", "unique(budget)", "One bucket per CereTax budget."),
+    ]
+
+    @api.model
+    def _ceretax_limits(self):
+        """Return ``{budget: (rate, burst)}`` from the system parameters."""
+        cfg = self.env["ceretax.api.mixin"]._ceretax_config()
+        return dict(cfg.transport_options["rate_limits"])
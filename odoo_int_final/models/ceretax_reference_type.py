@@ -0,0 +1,170 @@
+from odoo import models, fields, api, _
+from collections import defaultdict
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# kind -> (data API path, code key, description key)
+REFERENCE_KINDS = {
+    "unit": ("unitTypes", "unitType", "unitTypeDescription"),
+    "business": ("businessTypes", "businessType", "businessTypeDescription"),
+    "customer": ("customerTypes", "customerType", "customerTypeDescription"),
+    "seller": ("sellerTypes", "sellerType", "sellerTypeDescription"),
+}
+
+# (dbname, kind) -> (built at, selection); other workers pick up changes
+# once the entry is older than SELECTION_CACHE_SECONDS
+SELECTION_CACHE_SECONDS = 300
+_selections = {}
+_selections_lock = threading.Lock()
+
+
+class CeretaxReferenceType(models.Model):
+    _name = "ceretax.reference.type"
+    _description = "CereTax Reference Type"
+    _order = "kind, code"
+    _rec_name = "description"
+
+    kind = fields.Selection([
+        ("unit", "Unit Type"),
+        ("business", "Business Type"),
+        ("customer", "Customer Type"),
+        ("seller", "Seller Type"),
+    ], required=True, readonly=True, index=True)
+    code = fields.Char(required=True, readonly=True)
+    description = fields.Char(readonly=True)
+    active = fields.Boolean(default=True, readonly=True,
+                            help="Types no longer returned by CereTax are archived.")
+    synced_at = fields.Datetime(string="Last Synchronized", readonly=True)
+
+    _sql_constraints = [
+        ("kind_code_uniq", "unique(kind, code)", "Reference type codes must be unique per kind."),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        res._ceretax_selection_changed()
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"kind", "code", "description", "active"}.intersection(vals):
+            self._ceretax_selection_changed()
+        return res
+
+    def unlink(self):
+        self._ceretax_selection_changed()
+        return super().unlink()
+
+    def _ceretax_selection_changed(self):
+        """Drop the cached selections of the kinds of ``self`` once the
+        transaction commits; until then they are read uncached."""
+        cr = self.env.cr
+        dirty = cr.postcommit.data.setdefault("ceretax.reference_types_dirty", set())
+        if not dirty:
+            dbname = cr.dbname
+
+            @cr.postcommit.add
+            def drop_selections():
+                with _selections_lock:
+                    for kind in dirty:
+                        _selections.pop((dbname, kind), None)
+        dirty.update(self.mapped("kind"))
+
+    @api.model
+    def _ceretax_selection(self, kind):
+        """Return the ``(code, description)`` pairs of the active types of ``kind``."""
+        cr = self.env.cr
+        key = (cr.dbname, kind)
+        dirty = kind in cr.postcommit.data.get("ceretax.reference_types_dirty", ())
+        if not dirty:
+            with _selections_lock:
+                built_at, selection = _selections.get(key, (0, None))
+            if selection is not None and time.monotonic() - built_at < SELECTION_CACHE_SECONDS:
+                return selection
+
+        types = self.sudo().with_context(active_test=True).search_read(
+            [("kind", "=", kind)], ["code", "description"], order="code")
+        selection = tuple((t["code"], t["description"] or t["code"]) for t in types)
+        if not dirty:
+            with _selections_lock:
+                _selections[key] = (time.monotonic(), selection)
+        return selection
+
+    @api.model
+    def _ceretax_fetch(self, kind):
+        """Return ``{code: description}`` as listed by the CereTax data API."""
+        path, code_key, description_key = REFERENCE_KINDS[kind]
+        response = self.env["res.config.settings"]._ceretax_data_request(path, {
+            "accept": "application/json",
+            "x-api-key": self.env["ceretax.api.mixin"]._ceretax_config().api_key,
+        })
+        response.raise_for_status()
+        return {
+            str(item[code_key]): item.get(description_key) or ""
+            for item in response.json()
+            if item.get(code_key)
+        }
+
+    @api.model
+    def _ceretax_sync(self, kinds=None):
+        """Refresh the local types from CereTax.
+
+        New codes are created, changed descriptions updated and codes no
+        longer listed archived; a kind that cannot be fetched is left as is.
+
+        :return: ``{kind: error message}`` of the kinds that failed
+        """
+        errors = {}
+        now = fields.Datetime.now()
+        for kind in kinds or REFERENCE_KINDS:
+            try:
+                feed = self._ceretax_fetch(kind)
+            except Exception as e:
+                _logger.warning("ceretax: could not fetch the %s types: %s", kind, e)
+                errors[kind] = str(e)
+                continue
+
+            existing = {t.code: t for t in self.with_context(active_test=False).search([("kind", "=", kind)])}
+            self.create([
+                {"kind": kind, "code": code, "description": description, "synced_at": now}
+                for code, description in feed.items() if code not in existing
+            ])
+            # one write for the archived codes, one per distinct description
+            to_archive = self.browse()
+            to_update = defaultdict(lambda: self.browse())
+            for code, record in existing.items():
+                if code not in feed:
+                    if record.active:
+                        to_archive |= record
+                elif not record.active or record.description != feed[code]:
+                    to_update[feed[code]] |= record
+            to_archive.write({"active": False, "synced_at": now})
+            for description, records in to_update.items():
+                records.write({"active": True, "description": description, "synced_at": now})
+        return errors
+
+    @api.model
+    def _cron_ceretax_sync_reference_types(self):
+        self._ceretax_sync()
+
+    @api.model
+    def action_sync(self):
+        errors = self._ceretax_sync()
+        if errors:
+            message = _("Some reference types could not be synchronized: %s",
+                        ", ".join(sorted(errors)))
+        else:
+            message = _("CereTax reference types synchronized.")
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "message": message,
+                "type": "warning" if errors else "success",
+                "next": {"type": "ir.actions.client", "tag": "reload"},
+            },
+        }
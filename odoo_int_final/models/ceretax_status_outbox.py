@@ -0,0 +1,149 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from datetime import timedelta
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 6 * 3600
+DONE_RETENTION_DAYS = 30
+
+
+class CeretaxStatusOutbox(models.Model):
+    _name = "ceretax.status.outbox"
+    _description = "CereTax Status Sync Outbox"
+    _order = "id desc"
+    _rec_name = "move_id"
+
+    move_id = fields.Many2one("account.move", required=True, readonly=True, index=True, ondelete="cascade")
+    target_state = fields.Char(string="Invoice State", readonly=True,
+                               help="State of the invoice when the latest change was queued.")
+    state = fields.Selection([
+        ("pending", "Pending"),
+        ("done", "Synced"),
+        ("failed", "Failed"),
+    ], default="pending", required=True, readonly=True, index=True)
+    attempts = fields.Integer(readonly=True, default=0)
+    next_attempt_at = fields.Datetime(readonly=True, default=fields.Datetime.now, index=True)
+    sent_at = fields.Datetime(readonly=True)
+    last_error = fields.Text(readonly=True)
+
+    def init(self):
+        # at most one pending entry per invoice: later changes update it
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ceretax_status_outbox_pending_uniq
+                ON ceretax_status_outbox (move_id) WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _ceretax_enqueue(self, moves):
+        """Queue a status sync of ``moves`` in the current transaction.
+
+        A move that already has a pending entry keeps that single entry,
+        updated to its latest state, so only the final state is sent.
+        """
+        if not moves:
+            return self
+        Outbox = self.sudo()
+        pending = Outbox.search([("move_id", "in", moves.ids), ("state", "=", "pending")])
+        by_move = {entry.move_id.id: entry for entry in pending}
+        now = fields.Datetime.now()
+        for move in moves.filtered(lambda m: m.id in by_move):
+            by_move[move.id].write({
+                "target_state": move.state,
+                "attempts": 0,
+                "next_attempt_at": now,
+                "last_error": False,
+            })
+        created = Outbox.create([
+            {"move_id": move.id, "target_state": move.state}
+            for move in moves if move.id not in by_move
+        ])
+        cron = self.env.ref("odoo_int_final.ir_cron_ceretax_status_outbox", raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return pending | created
+
+    @api.model
+    def _ceretax_max_attempts(self):
+        return self.env["ceretax.api.mixin"]._ceretax_config().status_max_attempts
+
+    @api.model
+    def _ceretax_claim(self, limit):
+        """Lock and return due pending entries, skipping those another
+        worker is already sending."""
+        self.env.cr.execute("""
+            SELECT id FROM ceretax_status_outbox
+             WHERE state = 'pending' AND next_attempt_at <= now() AT TIME ZONE 'UTC'
+          ORDER BY next_attempt_at, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [limit])
+        return self.sudo().browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _ceretax_send(self):
+        max_attempts = self._ceretax_max_attempts()
+        for entry in self:
+            move = entry.move_id
+            try:
+                with self.env.cr.savepoint():
+                    move._ceretax_auto_status_update(entry.target_state)
+            except Exception as e:
+                attempts = entry.attempts + 1
+                # a UserError is a configuration or data problem a retry won't fix
+                final = isinstance(e, UserError) or attempts >= max_attempts
+                delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempts - 1))
+                entry.write({
+                    "state": "failed" if final else "pending",
+                    "attempts": attempts,
+                    "next_attempt_at": fields.Datetime.now() + timedelta(seconds=delay),
+                    "last_error": str(e),
+                })
+                if final:
+                    move.message_post(body=_("CereTax status sync failed: %s", e))
+                continue
+            entry.write({
+                "state": "done",
+                "attempts": entry.attempts + 1,
+                "sent_at": fields.Datetime.now(),
+                "last_error": False,
+            })
+
+    @api.model
+    def _cron_ceretax_send_status(self, batch_size=100, time_budget=300):
+        """Send the pending status changes in committed batches."""
+        started = time.monotonic()
+        while True:
+            entries = self._ceretax_claim(batch_size)
+            if not entries:
+                break
+            entries._ceretax_send()
+            self.env.cr.commit()
+
+            if time.monotonic() - started > time_budget:
+                self.env.ref("odoo_int_final.ir_cron_ceretax_status_outbox")._trigger()
+                return
+
+        # the latest entry of a move stays: it holds the move's sync state
+        self.env.cr.execute("""
+            SELECT id FROM ceretax_status_outbox entry
+             WHERE state = 'done' AND sent_at < %s
+               AND EXISTS (SELECT 1 FROM ceretax_status_outbox newer
+                            WHERE newer.move_id = entry.move_id AND newer.id > entry.id)
+        """, [fields.Datetime.now() - timedelta(days=DONE_RETENTION_DAYS)])
+        self.sudo().browse([row[0] for row in self.env.cr.fetchall()]).unlink()
+
+    def action_retry(self):
+        failed = self.sudo().filtered(lambda e: e.state == "failed")
+        # a newer pending entry of the same invoice is sent anyway
+        pending = self.sudo().search([("move_id", "in", failed.move_id.ids), ("state", "=", "pending")])
+        failed.filtered(lambda e: e.move_id not in pending.move_id).write({
+            "state": "pending",
+            "attempts": 0,
+            "next_attempt_at": fields.Datetime.now(),
+        })
+        self.env.ref("odoo_int_final.ir_cron_ceretax_status_outbox")._trigger()
+        return True
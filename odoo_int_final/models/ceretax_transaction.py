@@ -1,5 +1,80 @@
+from odoo import models, fields, api, _
+from urllib.parse import urlsplit
+import base64
+import gzip
+import hashlib
+import json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .ceretax_rate_limit import BUDGETS
+
+STATUS_PATHS = ("/status", "/test")
+OFFLOADED_BODIES = ("request_body", "response_body")
+PREVIEW_SIZE = 1024
+DEFAULT_OFFLOAD_BYTES = 64 * 1024
+
+
+def compress_body(text):
+    """Return ``(codec, compressed bytes)`` for a body."""
+    raw = text.encode()
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=6).compress(raw)
+    return "gzip", gzip.compress(raw, compresslevel=6)
+
+
+def decompress_body(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            return _("Body compressed with zstd, install the zstandard package to read it.")
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    return gzip.decompress(data).decode()
+
+
+def endpoint_family(endpoint):
+    """Return the quota budget ("calc", "av", "data", "status") of a URL."""
+    if not endpoint:
+        return False
+    url = urlsplit(endpoint)
+    host = url.hostname or ""
+    if host.startswith("av."):
+        return "av"
+    if host.startswith("data."):
+        return "data"
+    if url.path.rstrip("/") in STATUS_PATHS:
+        return "status"
+    if host.startswith("calc."):
+        return "calc"
+    return False
+
+
+def _load_json(body):
+    if not body:
+        return {}
+    try:
+        data = json.loads(body)
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def extract_transaction_values(endpoint, request_body, response_body):
+    """Extract the indexed lookup columns of a log entry from its bodies."""
+    response = _load_json(response_body)
+    request = _load_json(request_body)
+    invoice = response.get("invoice") if isinstance(response.get("invoice"), dict) else {}
+    request_invoice = request.get("invoice") if isinstance(request.get("invoice"), dict) else {}
+    trace = response.get("systemTraceAuditNumber")
+    return {
+        "invoice_number": invoice.get("invoiceNumber") or request_invoice.get("invoiceNumber") or False,
+        "ksuid": response.get("ksuid") or False,
+        "system_trace_number": str(trace) if trace else False,
+        "endpoint_family": endpoint_family(endpoint),
+    }
 
-from odoo import models, fields
 
 class CeretaxTransaction(models.Model):
     _name="ceretax.transaction"
@@ -9,7 +84,7 @@ class CeretaxTransaction(models.Model):
     request_headers=fields.Text()
     request_body=fields.Text()
     response_body=fields.Text()
-    status_code=fields.Integer()
+    status_code=fields.Integer(index=True)
     name = fields.Char(string="Transaction Name", required=True)
     request_payload = fields.Text()
     response_payload = fields.Text()
@@ -17,4 +92,125 @@ class CeretaxTransaction(models.Model):
     partner_id = fields.Many2one("res.partner")
     sale_order_id = fields.Many2one("sale.order")
     sale_line_id = fields.Many2one("sale.order.line")
-    timestamp = fields.Datetime(default=lambda self: fields.Datetime.now())
+    timestamp = fields.Datetime(default=lambda self: fields.Datetime.now(), index=True)
+    duration_ms = fields.Integer(string="Duration (ms)", readonly=True)
+
+    # lookup columns extracted from the bodies when the entry is written
+    invoice_number = fields.Char(index=True, readonly=True)
+    ksuid = fields.Char(string="KSUID", index=True, readonly=True)
+    system_trace_number = fields.Char(string="System Trace Audit Number", index=True, readonly=True)
+    res_model = fields.Char(string="Document Model", index=True, readonly=True)
+    res_id = fields.Integer(string="Document ID", index=True, readonly=True)
+    endpoint_family = fields.Selection(BUDGETS, index=True, readonly=True)
+
+    # bodies above the offload size only keep a preview here; the full
+    # text is compressed into ceretax.transaction.body
+    request_body_hash = fields.Char(readonly=True)
+    response_body_hash = fields.Char(readonly=True)
+    body_ids = fields.One2many("ceretax.transaction.body", "transaction_id", readonly=True)
+    body_offloaded = fields.Boolean(readonly=True)
+    request_body_full = fields.Text(compute="_compute_body_full")
+    response_body_full = fields.Text(compute="_compute_body_full")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        offload_bytes = self.env["ceretax.api.mixin"]._ceretax_config().log_body_offload_bytes
+
+        bodies = []
+        for vals in vals_list:
+            extracted = extract_transaction_values(
+                vals.get("endpoint"), vals.get("request_body"), vals.get("response_body"))
+            for key, value in extracted.items():
+                if not vals.get(key):
+                    vals[key] = value
+
+            offloaded = []
+            for field_name in OFFLOADED_BODIES:
+                body = vals.get(field_name)
+                if offload_bytes <= 0 or not body or len(body) <= offload_bytes:
+                    continue
+                codec, data = compress_body(body)
+                offloaded.append({
+                    "field_name": field_name,
+                    "codec": codec,
+                    "size": len(body),
+                    "data": base64.b64encode(data),
+                })
+                vals[f"{field_name}_hash"] = hashlib.sha256(body.encode()).hexdigest()
+                vals[field_name] = body[:PREVIEW_SIZE]
+                vals["body_offloaded"] = True
+            bodies.append(offloaded)
+
+        records = super().create(vals_list)
+
+        blob_vals = [
+            dict(body, transaction_id=record.id)
+            for record, offloaded in zip(records, bodies)
+            for body in offloaded
+        ]
+        if blob_vals:
+            self.env["ceretax.transaction.body"].sudo().create(blob_vals)
+        return records
+
+    def unlink(self):
+        # remove the filestore attachments of the compressed bodies
+        self.sudo().body_ids.unlink()
+        return super().unlink()
+
+    def _compute_body_full(self):
+        for rec in self:
+            full = {body.field_name: body._ceretax_text() for body in rec.body_ids}
+            rec.request_body_full = full.get("request_body", rec.request_body)
+            rec.response_body_full = full.get("response_body", rec.response_body)
+
+    def action_view_full_body(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("Full Bodies"),
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "views": [(self.env.ref("odoo_int_final.view_ceretax_transaction_body_form").id, "form")],
+            "target": "new",
+        }
+
+    @api.model
+    def _ceretax_find_for_invoice(self, move):
+        """Return the latest logged calculation of the invoice ``move``.
+
+        Rows logged before the document columns existed are matched on the
+        invoice number instead.
+        """
+        tx = self.sudo().search([
+            ("res_model", "=", move._name),
+            ("res_id", "=", move.id),
+            ("ksuid", "!=", False),
+        ], order="id desc", limit=1)
+        if tx or not move.name:
+            return tx
+        return self.sudo().search([
+            ("res_model", "=", False),
+            ("invoice_number", "=", move.name),
+            ("ksuid", "!=", False),
+        ], order="id desc", limit=1)
+
+class CeretaxTransactionBody(models.Model):
+    _name = "ceretax.transaction.body"
+    _description = "CereTax Log Compressed Body"
+
+    transaction_id = fields.Many2one("ceretax.transaction", required=True, ondelete="cascade", index=True)
+    field_name = fields.Selection([
+        ("request_body", "Request Body"),
+        ("response_body", "Response Body"),
+    ], required=True)
+    codec = fields.Selection([("gzip", "gzip"), ("zstd", "zstd")], required=True, default="gzip")
+    size = fields.Integer(string="Uncompressed Size")
+    data = fields.Binary(attachment=True)
+
+    def _ceretax_text(self):
+        self.ensure_one()
+        raw = self.with_context(bin_size=False).data
+        if not raw:
+            return ""
+        return decompress_body(self.codec, base64.b64decode(raw))
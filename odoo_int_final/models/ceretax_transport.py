@@ -0,0 +1,220 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .ceretax_circuit_breaker import CircuitBreaker, CircuitOpenError
+from .ceretax_http_metric import metrics
+from .ceretax_rate_limit import RateLimiter, RateLimitError
+
+_logger = logging.getLogger(__name__)
+
+
+ENVIRONMENTS = {
+    "cert": {
+        "transaction_base": "https://calc.cert.ceretax.net",
+        "address_base": "https://av.cert.ceretax.net",
+        "data_base": "https://data.cert.ceretax.net",
+    },
+    # address validation and data are only served from the cert hosts
+    "prod": {
+        "transaction_base": "https://calc.prod.ceretax.net",
+        "address_base": "https://av.cert.ceretax.net",
+        "data_base": "https://data.cert.ceretax.net",
+    },
+}
+
+# host family -> ENVIRONMENTS key
+HOSTS = {
+    "calc": "transaction_base",
+    "av": "address_base",
+    "data": "data_base",
+}
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUTS = {"calc": 30.0, "av": 20.0, "data": 10.0}
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 8.0
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+RETRY_STATUSES = (500, 502, 503, 504)
+THROTTLED_STATUS = 429
+
+
+class CeretaxTransport:
+    """Keep-alive HTTP sessions to the CereTax hosts, one pool per host.
+
+    Instances are shared by every caller of a worker process (see
+    :func:`get_transport`) and never touch the ORM, so they can be used
+    from helper threads as well.
+    """
+
+    def __init__(self, dbname, environment, api_key, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, timeouts=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF, breaker=None, rate_limits=None, rate_limit_max_wait=10.0):
+        self.dbname = dbname
+        self.environment = environment if environment in ENVIRONMENTS else "cert"
+        self.api_key = api_key or ""
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.connect_timeout = connect_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.breaker_options = dict(breaker or {})
+        self.breaker = CircuitBreaker(dbname, **self.breaker_options)
+        self.limiter = RateLimiter(dbname, rate_limits, rate_limit_max_wait)
+        self.key = (environment, self.api_key, pool_connections, pool_maxsize,
+                    tuple(sorted(self.timeouts.items())), connect_timeout, max_retries,
+                    backoff, tuple(sorted(self.breaker_options.items())),
+                    tuple(sorted(self.limiter.limits.items())), rate_limit_max_wait)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def base_url(self, host):
+        return ENVIRONMENTS[self.environment][HOSTS[host]]
+
+    def url(self, host, path):
+        return f"{self.base_url(host)}/{path.lstrip('/')}"
+
+    def session(self, host):
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    if self.api_key:
+                        session.headers["x-api-key"] = self.api_key
+                    self._sessions[host] = session
+        return session
+
+    def request(self, host, method, path, headers=None, data=None, params=None,
+                json=None, timeout=None, idempotent=None, budget=None, **kwargs):
+        """Send a request to ``host``, retrying and feeding the circuit breaker.
+
+        Every attempt first takes a token from the rate limit ``budget``
+        (defaults to the host), queueing briefly when the quota is used up.
+        Idempotent calls (GET by default) are retried on connection errors,
+        timeouts and 5xx responses with jittered exponential backoff. Other
+        calls are only retried when the connection could not be opened, as
+        the request then never reached CereTax. Throttled (429) calls were
+        not processed and are retried whatever their method.
+        """
+        started = time.perf_counter()
+        status = "error"
+        try:
+            resp = self._request(host, method, path, headers, data, params, json,
+                                 timeout, idempotent, budget, **kwargs)
+            status = resp.status_code
+            return resp
+        except CircuitOpenError:
+            status = "circuit_open"
+            raise
+        except RateLimitError:
+            status = "rate_limited"
+            raise
+        except requests.exceptions.Timeout:
+            status = "timeout"
+            raise
+        finally:
+            metrics.observe(self.dbname, budget or host, status, time.perf_counter() - started)
+
+    def _request(self, host, method, path, headers, data, params, json, timeout,
+                 idempotent, budget, **kwargs):
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if timeout is None or not isinstance(timeout, tuple):
+            timeout = (self.connect_timeout, timeout or self.timeouts.get(host))
+
+        attempt = 0
+        while True:
+            self.limiter.acquire(budget or host)
+            self.breaker.before_call(host)
+            try:
+                resp = self.session(host).request(
+                    method.upper(),
+                    self.url(host, path),
+                    headers=headers,
+                    data=data,
+                    params=params,
+                    json=json,
+                    timeout=timeout,
+                    **kwargs
+                )
+            except requests.exceptions.RequestException as e:
+                self.breaker.record(host, False)
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                _logger.info("ceretax: %s %s failed (%s), retrying", method.upper(), path, e)
+            else:
+                failed = resp.status_code in RETRY_STATUSES
+                throttled = resp.status_code == THROTTLED_STATUS
+                self.breaker.record(host, not failed)
+                if not (failed and idempotent or throttled) or attempt >= self.max_retries:
+                    return resp
+                _logger.info("ceretax: %s %s returned %s, retrying", method.upper(), path, resp.status_code)
+                retry_after = self._retry_after(resp) if throttled else None
+                resp.close()
+                if retry_after is not None:
+                    time.sleep(retry_after)
+                    attempt += 1
+                    continue
+
+            self._sleep_backoff(attempt)
+            attempt += 1
+
+    def _sleep_backoff(self, attempt):
+        # "full jitter": uniform over [0, min(cap, base * 2^attempt)]
+        time.sleep(random.uniform(0, min(MAX_BACKOFF, self.backoff * (2 ** attempt))))
+
+    def _retry_after(self, resp):
+        try:
+            return min(self.limiter.max_wait, max(0.0, float(resp.headers.get("Retry-After"))))
+        except (TypeError, ValueError):
+            return None
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            try:
+                session.close()
+            except Exception:
+                _logger.debug("ceretax: error closing HTTP session", exc_info=True)
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(dbname, environment, api_key, **options):
+    """Return the process-wide transport of ``dbname``.
+
+    The transport is rebuilt (and its pools closed) whenever the
+    environment, API key or pool/timeout/retry options change.
+    """
+    candidate = CeretaxTransport(dbname, environment, api_key, **options)
+    with _transports_lock:
+        current = _transports.get(dbname)
+        if current is not None and current.key == candidate.key:
+            return current
+        _transports[dbname] = candidate
+    if current is not None:
+        _logger.info("ceretax: CereTax configuration changed, rebuilding HTTP pools")
+        current.close()
+    return candidate
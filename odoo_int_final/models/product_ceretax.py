@@ -13,8 +13,7 @@ class ProductTemplate(models.Model):
     @api.model
     def _get_ps_codes(self):
         """Load PS codes safely during UI field rendering and not during module load."""
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param("ceretax.api_key", "")
+        key = self.env['ceretax.api.mixin']._ceretax_config().api_key
 
         if not key:
             return []  # Do NOT block Odoo
@@ -85,8 +84,7 @@ class CeretaxCategory(models.Model):
     @api.model
     def _get_ps_codes(self):
         """Load PS codes safely during UI field rendering and not during module load."""
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param("ceretax.api_key", "")
+        key = self.env['ceretax.api.mixin']._ceretax_config().api_key
 
         if not key:
             return []  # Do NOT block Odoo
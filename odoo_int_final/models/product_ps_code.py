@@ -45,8 +45,7 @@ class CeretaxPsCode(models.Model):
     # API loader
     @api.model
     def load_from_api(self):
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param("ceretax.api_key", "")
+        key = self.env['ceretax.api.mixin']._ceretax_config().api_key
         if not key:
             return
 
@@ -1,10 +1,76 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
-import requests
+from odoo.tools.lru import LRU
+import codecs
+import hashlib
+import json
 import logging
+import tempfile
+import time
+
+from .ceretax_calc_metric import elapsed_ms
 
 _logger = logging.getLogger(__name__)
 
+# hash and HTTP validators of the last applied psCodes feed
+FEED_HASH_PARAM = 'ceretax.ps_code_feed_hash'
+ETAG_PARAM = 'ceretax.ps_code_etag'
+LAST_MODIFIED_PARAM = 'ceretax.ps_code_last_modified'
+# codes diffed and written together while the feed streams in
+SYNC_CHUNK_SIZE = 1000
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# the downloaded feed stays in memory up to this size, on disk beyond
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+JSON_SEPARATORS = ' \t\r\n,'
+JSON_VALUE_ENDS = tuple(JSON_SEPARATORS + ']')
+# (dbname, name, limit) -> (built at, ranked autocomplete results); other
+# workers pick up changes once an entry is older than AUTOCOMPLETE_CACHE_SECONDS
+AUTOCOMPLETE_CACHE_SECONDS = 300
+_autocomplete = LRU(1024)
+# fields the autocomplete results depend on
+AUTOCOMPLETE_FIELDS = {'ps_code', 'description', 'active'}
+
+
+def iter_json_array(chunks):
+    """Yield the items of the JSON array whose bytes are ``chunks``.
+
+    Only the item being decoded is kept in memory, whatever the size of
+    the array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    opened = closed = False
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        pos = 0
+        while not closed:
+            while pos < len(buffer) and buffer[pos] in JSON_SEPARATORS:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not opened:
+                if buffer[pos] != '[':
+                    raise ValueError('expected a JSON array')
+                opened = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                closed = True
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break  # incomplete item, wait for the next chunk
+            if not isinstance(item, (dict, list, str)) and buffer[end:end + 1] not in JSON_VALUE_ENDS:
+                break  # a number may continue in the next chunk
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+    if not closed:
+        raise ValueError('truncated JSON array')
+
+
 class CeretaxPSCode(models.Model):
     _name = 'ceretax.ps.code'
     _description = 'CereTax PS Codes'
@@ -14,57 +80,267 @@ class CeretaxPSCode(models.Model):
     description = fields.Text(string='Description')
     active = fields.Boolean(string='Active', default=True)
 
+    def init(self):
+        # code prefixes match on this index whatever the database collation
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS ceretax_ps_code_prefix_idx
+                ON ceretax_ps_code (ps_code varchar_pattern_ops) WHERE active
+        """)
+        if self.env.registry.has_trigram:
+            self.env.cr.execute("""
+                CREATE INDEX IF NOT EXISTS ceretax_ps_code_ps_code_trgm_idx
+                    ON ceretax_ps_code USING gin (ps_code gin_trgm_ops)
+            """)
+            self.env.cr.execute("""
+                CREATE INDEX IF NOT EXISTS ceretax_ps_code_description_trgm_idx
+                    ON ceretax_ps_code USING gin (description gin_trgm_ops)
+            """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        if res:
+            self._ceretax_autocomplete_changed()
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        if AUTOCOMPLETE_FIELDS.intersection(vals):
+            self._ceretax_autocomplete_changed()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._ceretax_autocomplete_changed()
+        return res
+
+    @api.model
+    def _ceretax_autocomplete_changed(self):
+        """Drop the cached autocomplete results now and again once the
+        transaction commits."""
+        _autocomplete.clear()
+        cr = self.env.cr
+        if not cr.postcommit.data.get('ceretax.ps_code_changed'):
+            cr.postcommit.data['ceretax.ps_code_changed'] = True
+            cr.postcommit.add(_autocomplete.clear)
+
+    @api.model
+    def name_search(self, name='', domain=None, operator='ilike', limit=100):
+        name = (name or '').strip()
+        if not name or domain or operator != 'ilike' or not limit \
+                or self.env['ir.rule']._compute_domain(self._name, 'read'):
+            return super().name_search(name, domain, operator, limit)
+        self.check_access('read')
+        key = (self.env.cr.dbname, name, limit)
+        built_at, results = _autocomplete.get(key, (0, None))
+        if results is None or time.monotonic() - built_at >= AUTOCOMPLETE_CACHE_SECONDS:
+            results = self._ceretax_ranked_search(name, limit)
+            _autocomplete[key] = (time.monotonic(), results)
+        return list(results)
+
     @api.model
-    def load_from_api(self):
+    def _ceretax_ranked_search(self, name, limit):
+        """Return the ``(id, code)`` pairs of the active codes matching ``name``.
+
+        Exact codes come first, then code prefixes, codes containing
+        ``name`` and finally matching descriptions; ties are ordered by
+        trigram similarity when pg_trgm is installed.
+        """
+        like = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        similarity = """GREATEST(similarity(ps_code, %(name)s),
+                                 similarity(COALESCE(description, ''), %(name)s)) DESC,""" \
+            if self.env.registry.has_trigram else ""
+        self.flush_model(['ps_code', 'description', 'active'])
+        self.env.cr.execute(f"""
+            SELECT id, ps_code
+              FROM ceretax_ps_code
+             WHERE active
+               AND (ps_code LIKE %(prefix)s OR ps_code ILIKE %(contains)s OR description ILIKE %(contains)s)
+          ORDER BY CASE WHEN ps_code = %(name)s THEN 0
+                        WHEN ps_code LIKE %(prefix)s THEN 1
+                        WHEN ps_code ILIKE %(contains)s THEN 2
+                        ELSE 3 END,
+                   {similarity} ps_code
+             LIMIT %(limit)s
+        """, {'name': name, 'prefix': like + '%', 'contains': '%' + like + '%', 'limit': limit})
+        return tuple(self.env.cr.fetchall())
+
+    @api.model
+    def load_from_api(self, force=False):
         """Fetch PS codes from external API and update/create records.
         Only differences are applied: new codes are created, existing ones updated,
         and codes not present in feed are deactivated.
+
+        The catalogue is streamed and applied in chunks of
+        ``SYNC_CHUNK_SIZE`` codes. Unless ``force`` is set, the ETag and
+        Last-Modified of the last applied catalogue are sent along and a
+        304 answer skips the download; for servers not sending them, the
+        download is hashed first and a catalogue identical to the last
+        applied one is not applied again.
         """
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param('ceretax.api_key', '')
+        started = time.perf_counter()
+        key = self.env['ceretax.api.mixin']._ceretax_config().api_key
         if not key:
             _logger.warning('ceretax: API key not configured (ir.config_parameter ceretax.api_key)')
             return {'warning': 'API key not found'}
 
-        url = 'https://data.cert.ceretax.net/psCodes'
+        icp = self.env['ir.config_parameter'].sudo()
         headers = {
             'accept': 'application/json',
             'x-api-key': key
         }
+        if not force:
+            etag = icp.get_param(ETAG_PARAM)
+            last_modified = icp.get_param(LAST_MODIFIED_PARAM)
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
 
+        result = {
+            'success': True,
+            'fetched': 0,
+            'created': 0,
+            'updated': 0,
+            'deactivated': 0,
+            'unchanged': False,
+            'not_modified': False,
+        }
+        apply_seconds = 0.0
         try:
-            response = requests.get(url, headers=headers, timeout=20)
-            response.raise_for_status()
-            data = response.json()
+            transport = self.env['ceretax.api.mixin']._ceretax_transport()
+            response = transport.request('data', 'get', 'psCodes', headers=headers, timeout=20, stream=True)
         except Exception as e:
             _logger.exception('ceretax: failed to fetch PS codes: %s', e)
             return {'error': 'Failed to fetch from API'}
 
-        incoming_codes = set()
-        for item in data:
-            code = item.get('psCode')
-            desc = item.get('psCodeDescription') or ''
-            if not code:
-                continue
-            incoming_codes.add(code)
-            rec = self.search([('ps_code', '=', code)], limit=1)
-            vals = {'description': desc, 'active': True}
-            if rec:
-                # update only if changed
-                if rec.description != desc or not rec.active:
-                    rec.write(vals)
-            else:
-                try:
-                    self.create({'ps_code': code, 'description': desc, 'active': True})
-                except Exception:
-                    _logger.exception('ceretax: failed to create ps.code %s', code)
+        with response, tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES) as feed:
+            if response.status_code == 304:
+                total_ms = elapsed_ms(time.perf_counter() - started)
+                result.update(unchanged=True, not_modified=True, fetch_ms=total_ms, apply_ms=0, total_ms=total_ms)
+                return result
+            try:
+                response.raise_for_status()
+                # first pass: download and hash the catalogue
+                feed_hash = hashlib.sha256()
+                for data in response.iter_content(DOWNLOAD_CHUNK_BYTES):
+                    feed_hash.update(data)
+                    feed.write(data)
+                feed_hash = feed_hash.hexdigest()
+                if not force and icp.get_param(FEED_HASH_PARAM) == feed_hash:
+                    self._ceretax_store_validators(response)
+                    total_ms = elapsed_ms(time.perf_counter() - started)
+                    result.update(unchanged=True, fetch_ms=total_ms, apply_ms=0, total_ms=total_ms)
+                    return result
+
+                # second pass: apply it chunk by chunk
+                feed.seek(0)
+                self._ceretax_start_feed()
+                chunk = {}
+                for item in iter_json_array(iter(lambda: feed.read(DOWNLOAD_CHUNK_BYTES), b'')):
+                    code = item.get('psCode') if isinstance(item, dict) else None
+                    if not code:
+                        continue
+                    chunk[code] = item.get('psCodeDescription') or ''
+                    if len(chunk) >= SYNC_CHUNK_SIZE:
+                        apply_seconds += self._ceretax_apply_chunk(chunk, result)
+                        chunk = {}
+                if chunk:
+                    apply_seconds += self._ceretax_apply_chunk(chunk, result)
+            except Exception as e:
+                _logger.exception('ceretax: failed to fetch PS codes: %s', e)
+                return {'error': 'Failed to fetch from API'}
 
         # deactivate codes not present anymore
-        to_deactivate = self.search([('ps_code', 'not in', list(incoming_codes)), ('active', '=', True)])
-        if to_deactivate:
-            try:
-                to_deactivate.write({'active': False})
-            except Exception:
-                _logger.exception('ceretax: failed to deactivate old ps.codes')
+        applied_at = time.perf_counter()
+        self.env.cr.execute("""
+            SELECT id FROM ceretax_ps_code p
+             WHERE active AND NOT EXISTS (
+                   SELECT 1 FROM ceretax_ps_code_feed f WHERE f.ps_code = p.ps_code)
+        """)
+        deactivate_ids = [row[0] for row in self.env.cr.fetchall()]
+        if deactivate_ids:
+            self.browse(deactivate_ids).write({'active': False})
+        result['deactivated'] = len(deactivate_ids)
+        apply_seconds += time.perf_counter() - applied_at
+
+        icp.set_param(FEED_HASH_PARAM, feed_hash)
+        self._ceretax_store_validators(response)
+
+        total = time.perf_counter() - started
+        result.update(
+            fetch_ms=elapsed_ms(total - apply_seconds),
+            apply_ms=elapsed_ms(apply_seconds),
+            total_ms=elapsed_ms(total),
+        )
+        _logger.info('ceretax: PS codes synchronized: %(fetched)s fetched, %(created)s created, '
+                     '%(updated)s updated, %(deactivated)s deactivated in %(total_ms)s ms', result)
+        return result
+
+    @api.model
+    def _ceretax_store_validators(self, response):
+        icp = self.env['ir.config_parameter'].sudo()
+        icp.set_param(ETAG_PARAM, response.headers.get('ETag') or False)
+        icp.set_param(LAST_MODIFIED_PARAM, response.headers.get('Last-Modified') or False)
+
+    @api.model
+    def _ceretax_start_feed(self):
+        """Create the temporary table collecting the codes of the feed."""
+        self.env.cr.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS ceretax_ps_code_feed (
+                ps_code varchar PRIMARY KEY
+            ) ON COMMIT DROP
+        """)
+        self.env.cr.execute("TRUNCATE ceretax_ps_code_feed")
+
+    @api.model
+    def _ceretax_apply_chunk(self, chunk, result):
+        """Create and update the codes of ``chunk``, a ``{code: description}``
+        dict, counting them into ``result``.
+
+        :return: the seconds spent
+        """
+        started = time.perf_counter()
+        codes = list(chunk)
+        self.env.cr.execute("""
+            INSERT INTO ceretax_ps_code_feed (ps_code)
+            SELECT unnest(%s::varchar[])
+            ON CONFLICT DO NOTHING
+        """, [codes])
+
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT id, ps_code, description, active
+              FROM ceretax_ps_code
+             WHERE ps_code = ANY(%s)
+        """, [codes])
+        existing = set()
+        update_ids, update_descriptions = [], []
+        for rec_id, code, description, active in self.env.cr.fetchall():
+            existing.add(code)
+            if not active or (description or '') != chunk[code]:
+                update_ids.append(rec_id)
+                update_descriptions.append(chunk[code])
+
+        to_create = [
+            {'ps_code': code, 'description': description, 'active': True}
+            for code, description in chunk.items() if code not in existing
+        ]
+        self.create(to_create)
+
+        if update_ids:
+            self.env.cr.execute("""
+                UPDATE ceretax_ps_code p
+                   SET description = v.description, active = TRUE,
+                       write_uid = %s, write_date = (now() at time zone 'UTC')
+                  FROM unnest(%s::int[], %s::text[]) AS v(id, description)
+                 WHERE p.id = v.id
+            """, [self.env.uid, update_ids, update_descriptions])
+            self._ceretax_autocomplete_changed()
 
-        return {'success': True, 'fetched': len(incoming_codes)}
+        result['fetched'] += len(chunk)
+        result['created'] += len(to_create)
+        result['updated'] += len(update_ids)
+        # release the records of the chunk so memory stays flat over the feed
+        self.env.invalidate_all()
+        return time.perf_counter() - started
@@ -1,14 +1,9 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-import requests, json
+import json
 
 
-ENVIRONMENTS = {
-    "cert":{"transaction_base":"https://calc.cert.ceretax.net"},
-    "prod":{"transaction_base":"https://calc.prod.ceretax.net"}
-}
-
 PARAM = {
     "api_key": "odoo_ceretax.api_key",
     "environment": "odoo_ceretax.environment",
@@ -90,6 +85,57 @@ class ResConfigSettings(models.TransientModel):
 
     about_ceretax = fields.Char(string="About CereTax URL", config_parameter="ceretax.about_url")
 
+    http_pool_connections = fields.Integer(string="HTTP Pools per Host", config_parameter="ceretax.http_pool_connections", default=4)
+    http_pool_maxsize = fields.Integer(string="HTTP Connections per Pool", config_parameter="ceretax.http_pool_maxsize", default=10)
+    http_timeout_calc = fields.Float(string="Calculation Timeout (s)", config_parameter="ceretax.http_timeout_calc", default=30.0)
+    http_timeout_av = fields.Float(string="Address Validation Timeout (s)", config_parameter="ceretax.http_timeout_av", default=20.0)
+    http_timeout_data = fields.Float(string="Data Lookup Timeout (s)", config_parameter="ceretax.http_timeout_data", default=10.0)
+    job_chunk_size = fields.Integer(string="Background Chunk Size", config_parameter="ceretax.job_chunk_size", default=50)
+    bulk_concurrency = fields.Integer(string="Bulk Calculation Concurrency", config_parameter="ceretax.bulk_concurrency", default=4)
+    http_connect_timeout = fields.Float(string="Connect Timeout (s)", config_parameter="ceretax.http_connect_timeout", default=5.0)
+    http_max_retries = fields.Integer(string="Retries", config_parameter="ceretax.http_max_retries", default=2)
+    http_backoff = fields.Float(string="Retry Backoff (s)", config_parameter="ceretax.http_backoff", default=0.5)
+    log_buffer_size = fields.Integer(string="Log Buffer Size", config_parameter="ceretax.log_buffer_size", default=1000)
+    log_flush_interval = fields.Float(string="Log Flush Interval (s)", config_parameter="ceretax.log_flush_interval", default=2.0)
+    log_body_offload_bytes = fields.Integer(string="Offload Bodies Above (bytes)", config_parameter="ceretax.log_body_offload_bytes", default=65536)
+    breaker_error_rate = fields.Float(string="Breaker Error Rate", config_parameter="ceretax.breaker_error_rate", default=0.5)
+    breaker_min_calls = fields.Integer(string="Breaker Minimum Calls", config_parameter="ceretax.breaker_min_calls", default=10)
+    breaker_window = fields.Integer(string="Breaker Window (s)", config_parameter="ceretax.breaker_window", default=60)
+    breaker_open_seconds = fields.Integer(string="Breaker Open Duration (s)", config_parameter="ceretax.breaker_open_seconds", default=30)
+    rate_limit_calc = fields.Float(string="Calculation Rate (req/s)", config_parameter="ceretax.rate_limit_calc")
+    rate_limit_av = fields.Float(string="Address Validation Rate (req/s)", config_parameter="ceretax.rate_limit_av")
+    rate_limit_data = fields.Float(string="Data Lookup Rate (req/s)", config_parameter="ceretax.rate_limit_data")
+    rate_limit_status = fields.Float(string="Status Update Rate (req/s)", config_parameter="ceretax.rate_limit_status")
+    rate_limit_max_wait = fields.Float(string="Maximum Queueing (s)", config_parameter="ceretax.rate_limit_max_wait", default=10.0)
+    breaker_status = fields.Char(string="Circuit Breakers", compute="_compute_breaker_status")
+    calc_cache_ttl = fields.Float(string="Calculation Cache TTL (hours)", config_parameter="ceretax.calc_cache_ttl", default=24.0)
+    metrics_token = fields.Char(string="Metrics Token", config_parameter="ceretax.metrics_token")
+    calc_metrics_days = fields.Integer(string="Keep Calculation Metrics (days)", config_parameter="ceretax.calc_metrics_days", default=30)
+    address_cache_ttl = fields.Float(string="Address Cache TTL (days)", config_parameter="ceretax.address_cache_ttl", default=30.0)
+    calc_cache_hit_rate = fields.Char(string="Calculation Cache Hit Rate", compute="_compute_calc_cache_hit_rate")
+
+    def _compute_calc_cache_hit_rate(self):
+        hits, lookups = self.env["ceretax.calc.cache"].sudo()._ceretax_hit_rate()
+        rate = (100.0 * hits / lookups) if lookups else 0.0
+        for rec in self:
+            rec.calc_cache_hit_rate = _("%(rate).1f%% (%(hits)s of %(lookups)s calculations)",
+                                        rate=rate, hits=hits, lookups=lookups)
+
+    def _compute_breaker_status(self):
+        summary = self.env["ceretax.circuit.breaker"]._ceretax_summary()
+        for rec in self:
+            rec.breaker_status = summary
+
+    def action_reset_circuit_breakers(self):
+        self.env["ceretax.circuit.breaker"].sudo().action_reset()
+        return True
+
+    def action_clear_calc_cache(self):
+        return self.env["ceretax.calc.cache"].action_clear()
+
+    def action_clear_address_cache(self):
+        return self.env["ceretax.address.cache"].action_clear()
+
     def get_values(self):
         """Load values from ir.config_parameter"""
         res = super().get_values()
@@ -132,21 +178,21 @@ class ResConfigSettings(models.TransientModel):
         icp.set_param(PARAM["unit_type"], self.unit_type or "")
         icp.set_param(PARAM["ps_code"], self.ps_code or "")
         icp.set_param(PARAM["tax_included"], str(bool(self.tax_included)))
+        # drop the cached CereTax configuration snapshots
+        self.env.registry.clear_cache()
 
     def action_test_connection(self):
-        icp = self.env['ir.config_parameter'].sudo()
-        env = icp.get_param("ceretax.environment", "cert") 
-        if env not in ENVIRONMENTS:
-            raise UserError(f"Unknown environment: {env}")
-
-        base = ENVIRONMENTS[env]["transaction_base"]
-        url = f"{base}/test"
-        key = icp.get_param("ceretax.api_key", "")
+        cfg = self.env["ceretax.api.mixin"]._ceretax_config()
+        env = cfg.environment
+        key = cfg.api_key
         if not key:
             raise UserError("API Key missing")
 
-        resp = requests.post(url, headers={"x-api-key": key})
-        self.env["ceretax.transaction"].sudo().create({
+        transport = self.env["ceretax.api.mixin"]._ceretax_transport()
+        url = transport.url("calc", "test")
+        resp = transport.request("calc", "post", "test", headers={"x-api-key": key},
+                                 idempotent=True, budget="status")
+        self.env["ceretax.api.mixin"]._ceretax_log({
             "name": f"Test Connection ({env.upper()})",
             "endpoint": url,
             "request_headers": json.dumps({"x-api-key": key}),
@@ -161,17 +207,18 @@ class ResConfigSettings(models.TransientModel):
             "params": {"message": "Connection OK", "type": "success"},
         }
 
-    def _get_ps_codes(self):
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param("ceretax.api_key", "")
+    def _ceretax_data_request(self, path, headers):
+        transport = self.env["ceretax.api.mixin"]._ceretax_transport()
+        return transport.request("data", "get", path, headers=headers)
 
-        url = "https://data.cert.ceretax.net/psCodes"
+    def _get_ps_codes(self):
+        key = self.env["ceretax.api.mixin"]._ceretax_config().api_key
         headers = {
             "accept": "application/json",
             "x-api-key": key
         }
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._ceretax_data_request("psCodes", headers)
             response.raise_for_status()
             data = response.json()
             # Build dropdown as (value, label)
@@ -183,73 +230,16 @@ class ResConfigSettings(models.TransientModel):
             return []
 
     def _get_unit_types(self):
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param("ceretax.api_key", "")
-
-        url = "https://data.cert.ceretax.net/unitTypes"
-        headers = {
-            "accept": "application/json",
-            "x-api-key": key
-        }
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            # Build dropdown as (value, label)
-            return [(c["unitType"], c["unitTypeDescription"]) for c in data]
-        except Exception:
-            return []
+        return list(self.env["ceretax.reference.type"]._ceretax_selection("unit"))
 
     def _get_business_types(self):
-        icp = self.env['ir.config_parameter'].sudo()
-        key = icp.get_param("ceretax.api_key", "")
-
-        url = "https://data.cert.ceretax.net/businessTypes"
-        headers = {
-            "accept": "application/json",
-            "x-api-key": key
-        }
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            # Build dropdown as (value, label)
-            return [(c["businessType"], c["businessTypeDescription"]) for c in data]
-        except Exception:
-            return []
+        return list(self.env["ceretax.reference.type"]._ceretax_selection("business"))
 
     def _get_customer_types(self):
-            icp = self.env['ir.config_parameter'].sudo()
-            key = icp.get_param("ceretax.api_key", "")
-
-            url = "https://data.cert.ceretax.net/customerTypes"
-            headers = {
-                "accept": "application/json",
-                "x-api-key": key
-            }
-            try:
-                response = requests.get(url, headers=headers, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                # Build dropdown as (value, label)
-                return [(c["customerType"], c["customerTypeDescription"]) for c in data]
-            except Exception:
-                return []
+        return list(self.env["ceretax.reference.type"]._ceretax_selection("customer"))
 
     def _get_seller_types(self):
-            icp = self.env['ir.config_parameter'].sudo()
-            key = icp.get_param("ceretax.api_key", "")
-
-            url = "https://data.cert.ceretax.net/sellerTypes"
-            headers = {
-                "accept": "application/json",
-                "x-api-key": key
-            }
-            try:
-                response = requests.get(url, headers=headers, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                # Build dropdown as (value, label)
-                return [(c["sellerType"], c["sellerTypeDescription"]) for c in data]
-            except Exception:
-                return []
+        return list(self.env["ceretax.reference.type"]._ceretax_selection("seller"))
+
+    def action_sync_reference_types(self):
+        return self.env["ceretax.reference.type"].action_sync()
@@ -13,18 +13,46 @@ class ResPartner(models.Model):
 
     ceretax_last_validation = fields.Text(
         string="CereTax Address Result", readonly=True)
+    # parsed form of ceretax_last_validation, kept in sync by create/write
+    ceretax_validation = fields.Json(
+        string="CereTax Validation Result", readonly=True, copy=False)
 
     ceretax_address_needs_update = fields.Boolean(
+        string="CereTax Address Needs Update",
         compute="_compute_ceretax_address_needs_update",
-        store=False
+        store=True,
+        index=True,
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            self._ceretax_parse_validation(vals)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        self._ceretax_parse_validation(vals)
+        return super().write(vals)
+
+    def _ceretax_parse_validation(self, vals):
+        """Fill ``ceretax_validation`` in ``vals`` from a written result text.
+
+        Texts that are not a validation result (status messages) leave the
+        stored result untouched.
+        """
+        if "ceretax_last_validation" not in vals or "ceretax_validation" in vals:
+            return
+        data = self._safe_load_ceretax(vals["ceretax_last_validation"])
+        if isinstance(data, dict) and data:
+            vals["ceretax_validation"] = data
+        elif not vals["ceretax_last_validation"]:
+            vals["ceretax_validation"] = False
+
     def action_ceretax_validate_address(self):
         self.ensure_one()
         api = self.env["ceretax.api.mixin"]
 
         result = api.validate_address(self)
-        self.ceretax_last_validation = str(result)
 
         if not result or "error" in result:
                
@@ -76,49 +104,30 @@ class ResPartner(models.Model):
             },
         ]
 
+    @api.depends(
+        "ceretax_validation",
+        "street", "street2", "city", "zip",
+        "state_id.code", "country_id.code",
+        "latitude", "longitude", "pluscode",
+    )
     def _compute_ceretax_address_needs_update(self):
         mixin = self.env["ceretax.api.mixin"]
 
         for rec in self:
-            raw = rec.ceretax_last_validation
-
-            if not raw:
-                rec.ceretax_address_needs_update = False
-                continue
-
-            data = None
-
-            # First try JSON
-            try:
-                data = json.loads(raw)
-            except Exception:
-                pass
-
-            # If JSON fails, try Python dict string
-            if data is None:
-                try:
-                    data = ast.literal_eval(raw)
-                except Exception:
-                    rec.ceretax_address_needs_update = False
-                    continue
-
-            # Now 'data' is guaranteed to be a proper dict
-            rec.ceretax_address_needs_update = mixin._check_validated_address_diff(
-                rec, data
+            data = rec.ceretax_validation
+            rec.ceretax_address_needs_update = bool(
+                isinstance(data, dict) and data
+                and mixin._check_validated_address_diff(rec, data)
             )
 
     def action_apply_validated_address(self):
         self.ensure_one()
         mixin = self.env["ceretax.api.mixin"]
 
-        data = self._safe_load_ceretax(self.ceretax_last_validation)
+        data = self.ceretax_validation or self._safe_load_ceretax(self.ceretax_last_validation)
 
         mixin.apply_validated_address(self, data)
 
-        # refresh button state
-        self._compute_ceretax_address_needs_update()
-
-
     def _safe_load_ceretax(self, raw):
         if not raw:
             return {}
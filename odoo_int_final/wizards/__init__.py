@@ -1 +1,2 @@
 from . import fetch_ps_code_wizard
+from . import ceretax_tax_consolidation_wizard
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+
+class CeretaxTaxConsolidationWizard(models.TransientModel):
+    _name = 'ceretax.tax.consolidation.wizard'
+    _description = 'Consolidate duplicated CereTax taxes'
+
+    report = fields.Text(string='Dry-Run Report', readonly=True)
+
+    def _reopen(self):
+        return {'type': 'ir.actions.act_window', 'res_model': self._name, 'view_mode': 'form', 'res_id': self.id, 'target': 'new'}
+
+    def action_dry_run(self):
+        self.report = self.env['account.tax']._ceretax_consolidation_report()
+        return self._reopen()
+
+    def action_consolidate(self):
+        if not self.report:
+            raise UserError(_('Run the dry run and review its report before consolidating.'))
+        cron = self.env.ref('odoo_int_final.ir_cron_ceretax_consolidate_taxes').sudo()
+        cron.active = True
+        cron._trigger()
+        self.report = _('Consolidation scheduled. It runs in the background in resumable chunks.')
+        return self._reopen()
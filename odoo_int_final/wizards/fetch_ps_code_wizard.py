@@ -9,14 +9,27 @@ class CeretaxFetchPSCodeWizard(models.TransientModel):
     _description = 'Fetch PS Codes from CereTax'
 
     info = fields.Text(string='Info', readonly=True)
+    force = fields.Boolean(string='Full Download',
+                           help='Download and compare the whole catalogue even when CereTax reports it unchanged.')
 
     def action_fetch(self):
         ps_model = self.env['ceretax.ps.code']
-        res = ps_model.load_from_api()
+        res = ps_model.load_from_api(force=self.force)
         if not res:
             self.info = 'No response from API (check logs and API key)'
         elif res.get('error'):
             self.info = 'Error: %s' % res.get('error')
+        elif res.get('warning'):
+            self.info = 'Warning: %s' % res.get('warning')
+        elif res.get('not_modified'):
+            self.info = 'Success: catalogue not modified since the last synchronization, ' \
+                        'download skipped (%s ms)' % res['total_ms']
+        elif res.get('unchanged'):
+            self.info = 'Success: fetched %s codes, catalogue unchanged since the last synchronization ' \
+                        '(fetch %s ms, total %s ms)' % (res['fetched'], res['fetch_ms'], res['total_ms'])
         else:
-            self.info = 'Success: fetched %s codes' % res.get('fetched', 0)
+            self.info = 'Success: fetched %s codes, %s created, %s updated, %s deactivated ' \
+                        '(fetch %s ms, apply %s ms, total %s ms)' % (
+                            res['fetched'], res['created'], res['updated'], res['deactivated'],
+                            res['fetch_ms'], res['apply_ms'], res['total_ms'])
         return {'type': 'ir.actions.act_window', 'res_model': self._name, 'view_mode': 'form', 'res_id': self.id, 'target': 'new'}